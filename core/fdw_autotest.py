@@ -31,7 +31,7 @@ class TestVirtualFDWManager:
             
             yield m
 
-    def test_load_save_config(self, tmp_path):
+    def test_load_save_config(self, tmp_path, monkeypatch):
         """Тестирование загрузки/сохранения конфигурации"""
         # 1. Подготовка тестового .env файла
         env_path = tmp_path / ".env"
@@ -57,13 +57,15 @@ class TestVirtualFDWManager:
             assert m.table_mapping == {"table1": "db1"}
             assert m.join_config == [{"key": "id"}]
 
-        # 3. Тестирование сохранения
-        with patch('builtins.open') as mock_open:
-            m.save_env_config()
-            mock_open.assert_called()
-            written_content = mock_open().write.call_args[0][0]
-            assert "CONNECTIONS=" in written_content
-            assert "TABLE_MAPPINGS=" in written_content
+        # 3. Тестирование сохранения: .env в tmp_path подменяется целиком
+        os.chmod(env_path, 0o600)
+        monkeypatch.chdir(tmp_path)
+        m.save_env_config()
+        written_content = env_path.read_text()
+        assert "CONNECTIONS=" in written_content
+        assert "TABLE_MAPPINGS=" in written_content
+        assert os.stat(env_path).st_mode & 0o777 == 0o600
+        assert not (tmp_path / ".env.tmp").exists()
 
     def test_parse_sql(self, manager):
         """Тестирование парсера SQL запросов"""
@@ -85,6 +87,114 @@ class TestVirtualFDWManager:
         assert len(parsed['joins']) == 1
         assert parsed['where'] == 'u.age > 30'
 
+    def test_split_helpers(self):
+        """Тестирование разбиения колонок и условий WHERE"""
+        cols = VirtualFDWManager._split_columns("u.id, COALESCE(o.x, 'a,b'), \"имя, фам\"")
+        assert cols == ['u.id', "COALESCE(o.x, 'a,b')", '"имя, фам"']
+        
+        conds = VirtualFDWManager._split_where_conditions(
+            "u.age > 30 AND name = 'Tom and Jerry' OR (a = 1 AND b = 2) AND brand = 'x'"
+        )
+        assert conds == ['u.age > 30', "name = 'Tom and Jerry'", '(a = 1 AND b = 2)', "brand = 'x'"]
+        
+        # AND внутри BETWEEN не разделяет условия
+        conds = VirtualFDWManager._split_where_conditions("x BETWEEN 1 AND 5 AND y = 2 OR z = 3")
+        assert conds == ['x BETWEEN 1 AND 5', 'y = 2', 'z = 3']
+        
+        # Условия таблицы выбираются из условий AND верхнего уровня
+        m = VirtualFDWManager.__new__(VirtualFDWManager)
+        assert m._extract_table_where("u.a = 'x AND y' AND o.b = 1", 'u') == "u.a = 'x AND y'"
+
+    def test_columns_for_table(self):
+        """Тестирование выбора колонок таблицы по алиасу и полному имени"""
+        m = VirtualFDWManager.__new__(VirtualFDWManager)
+        
+        # Алиас совпадает с именем схемы
+        assert m._get_columns_for_table(['s.id', 's.total'], 's', 's.orders') == ['id', 'total']
+        
+        # Полное имя, алиас, чужая таблица и колонка без таблицы
+        cols = ['u.id', 'public.users.name', 'o.product', 'age']
+        assert m._get_columns_for_table(cols, 'u', 'public.users') == ['id', 'name', 'age']
+        assert m._get_columns_for_table(['o.product'], 'u', 'public.users') == ['*']
+        assert m._get_columns_for_table(['u.id', '*'], 'u', 'public.users') == ['*']
+
+    def test_prepare_where_condition(self):
+        """Тестирование перевода условия WHERE в синтаксис pandas"""
+        m = VirtualFDWManager.__new__(VirtualFDWManager)
+        cols = ['users.name', 'users.age', 'users.id']
+        prepare = m._prepare_where_condition
+        
+        # Имена колонок внутри строковых литералов не заменяются
+        assert prepare("users.name = 'name and age'", cols) == '`users.name` == "name and age"'
+        assert prepare("name = 'O''Brien'", cols) == '`users.name` == "O\'Brien"'
+        
+        # Операторы и ключевые слова в любом регистре
+        assert prepare("u.age <> 30", cols) == '`users.age` != 30'
+        assert prepare("age >= 18 And NOT id = 1 or name = 'x'", cols) == \
+            '`users.age` >= 18 and not `users.id` == 1 or `users.name` == "x"'
+        assert prepare("id IN (1, 2)", cols) == '`users.id` in (1, 2)'
+        assert prepare("id not In (1, 2)", cols) == '`users.id` not in (1, 2)'
+        
+        # Результат понимает DataFrame.query
+        df = pd.DataFrame({'users.name': ['Tom', 'age'], 'users.age': [30, 40], 'users.id': [1, 3]})
+        assert df.query(prepare("id IN (1, 2)", cols))['users.id'].tolist() == [1]
+        assert df.query(prepare("age <> 30 AND name = 'age'", cols))['users.id'].tolist() == [3]
+
+    def test_apply_where_manually(self):
+        """Тестирование ручной фильтрации: типы колонок и NULL"""
+        m = VirtualFDWManager.__new__(VirtualFDWManager)
+        m.log_messages = []
+        df = pd.DataFrame({
+            't.n': pd.array([1, 2, None, 4], dtype='Int64'),
+            't.f': [1.0, float('nan'), 2.0, 3.0],
+            't.s': ['2', 'a or b', None, '2'],
+            't.o': [2, '2', 'a and b', None],
+        }, index=[10, 11, 12, 13])
+        where = lambda cond: m._apply_where_manually(df, cond).index.tolist()
+        
+        # Числовая строка сравнивается с целой колонкой как число
+        assert where('`t.n` == "2"') == [11]
+        # В колонке object значения сравниваются как строки: 2 и '2' равны
+        assert where('`t.o` == "2"') == [10, 11]
+        
+        # NULL не проходит ни ==, ни != (nullable Int64 и NaN во float)
+        assert where('`t.n` != 2') == [10, 13]
+        assert where('`t.f` != 2') == [10, 13]
+        assert where('`t.n`.isna()') == [12]
+        
+        # Неподдерживаемый оператор и неизвестная колонка не выбирают строк
+        assert where('`t.n` > 1 and `t.f` == 3') == []
+        assert where('`t.x` == 1') == []
+        
+        # AND связывает сильнее OR; строки с NULL в одном из условий не теряют другое
+        assert where('`t.n` == 1 or `t.f` == 3') == [10, 13]
+        assert where('`t.n` != 1 and `t.s` == "2" OR `t.n`.isna()') == [12, 13]
+        
+        # OR и AND внутри строковых литералов не разделяют условия
+        assert where('`t.s` == "a or b"') == [11]
+        assert where('`t.o` == "a and b"') == [12]
+        
+        # Скобки группируют условия; неподдерживаемое условие в группе OR не выбирает строк
+        assert where('(`t.n` == 1 or `t.n` == 4) and `t.f` == 3') == [13]
+        assert where('`t.n` > 1 or `t.n` == 1') == [10]
+
+    def test_schema_mapping_index(self):
+        """Тестирование обратного индекса маппинга схем"""
+        m = VirtualFDWManager.__new__(VirtualFDWManager)
+        m._schema_mapping = {'sales': 'db1', 'hr': 'db1', 'logs': 'db2'}
+        m._rebuild_schema_index()
+        
+        # Маппинг доступен только для чтения: запись мимо map_schema сломала бы индекс
+        with pytest.raises(TypeError):
+            m.schema_mapping['crm'] = 'db1'
+        
+        m.map_schema('sales', 'db2')  # Перенос схемы на другое подключение
+        m.unmap_schema('logs')
+        assert m.remove_schema_mappings('db1') == ['hr']
+        assert m.schema_mapping == {'sales': 'db2'}
+        assert m.remove_schema_mappings('db2') == ['sales']
+        assert m.schema_mapping == {}
+
     def test_execute_query_single_table(self, manager):
         """Тест запроса к одной таблице"""
         # 1. Мокирование курсора и результатов
@@ -1,13 +1,75 @@
 from dotenv import load_dotenv
 import psycopg2
 import pandas as pd
+import numpy as np
 import re
+import copy
 import json
 import time
 import os
+import shutil
 from collections import defaultdict
-from typing import Dict, List, Optional, Union, Any, Tuple
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Union, Any, Tuple
 from .security import AuthManager
+from .sql_scan import SQL_TOKEN_RE, split_columns_spans, split_where_spans, strip_outer_parens
+
+
+# Конец условия WHERE
+_WHERE_TERMINATORS_RE = re.compile(r'\b(?:group\s+by|order\s+by|limit)\b', re.IGNORECASE)
+# Ключевые слова FROM: AS во всех вариантах регистра, чтобы не вызывать lower()
+_AS_KEYWORD = frozenset({'AS', 'as', 'As', 'aS'})
+_JOIN_KEYWORDS = frozenset({'inner', 'outer', 'left', 'right', 'full', 'cross'})
+_JOIN_KEYWORD_MAX_LEN = max(len(k) for k in _JOIN_KEYWORDS)
+# Разделители условий при ручной фильтрации: сначала группы OR, внутри них условия AND
+_OR_SEPARATOR = frozenset({'OR'})
+_AND_SEPARATOR = frozenset({'AND'})
+# Замена операторов SQL на операторы pandas
+_PANDAS_OPERATORS = {'=': '==', '<>': '!='}
+_PANDAS_KEYWORDS = frozenset({'AND', 'OR', 'NOT', 'IN'})
+# Литералы для сравнения с булевыми колонками
+_BOOL_LITERALS = {'true': True, 't': True, '1': True, 'false': False, 'f': False, '0': False}
+# Кеш содержимого .env: путь -> ((mtime, size), текст)
+_ENV_CACHE = {}
+
+
+@dataclass(slots=True)
+class JoinSpec:
+    """JOIN из текста запроса."""
+    table: str
+    alias: Optional[str]
+    condition: str
+    kind: str
+
+
+@dataclass(slots=True)
+class TableInfo:
+    """Таблица запроса с ее подключением и алиасом."""
+    connection: str
+    schema: str
+    table_name: str
+    alias: str
+    columns: List[str] = field(default_factory=list)
+
+
+def read_env_file(env_path: str) -> str:
+    """Содержимое .env; файл перечитывается только при смене mtime или размера."""
+    st = os.stat(env_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _ENV_CACHE.get(env_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(env_path, 'r') as f:
+        content = f.read()
+    _ENV_CACHE[env_path] = (stamp, content)
+    return content
+
+
+def invalidate_env_cache() -> None:
+    """Сброс кеша .env после записи в файл."""
+    _ENV_CACHE.clear()
 
 
 class VirtualFDWManager:
@@ -15,8 +77,11 @@ class VirtualFDWManager:
         """Инициализация менеджера виртуальных FDW подключений."""
         self.connection_params = {}
         self.table_mapping = {}  # Маппинг таблиц на подключения
+        self._schema_mapping = {}  # Маппинг схем на подключения; меняется только через map_schema/unmap_schema
+        self._conn_to_schemas = defaultdict(set)  # Обратный индекс: подключение -> схемы
         self.join_config = []    # Конфигурация JOIN между таблицами
         self.connections = {}    # Активные подключения
+        self._session_depth = 0  # Вложенность session(): пока > 0, подключения не закрываются
         self.log_messages = []   # Лог сообщений
         self.saved_credentials = {}
         self.load_env_config()
@@ -35,9 +100,11 @@ class VirtualFDWManager:
             self.log(f"Загружаем конфигурацию из файла: {env_path}")
             
             # Создаем файл, если он не существует
-            if not os.path.exists(env_path):
-                with open(env_path, 'w') as f:
+            try:
+                with open(env_path, 'x') as f:
                     f.write("CONNECTIONS={}\nTABLE_MAPPINGS={}\nJOIN_CONFIG=[]\n")
+            except FileExistsError:
+                pass
             
             load_dotenv(env_path, override=True)
             
@@ -49,6 +116,10 @@ class VirtualFDWManager:
             self.table_mapping = json.loads(os.getenv("TABLE_MAPPINGS", "{}"))
             self.log(f"Загружен маппинг таблиц: {self.table_mapping}")
             
+            # Загрузка маппинга схем
+            self._schema_mapping = json.loads(os.getenv("SCHEMA_MAPPINGS", "{}"))
+            self._rebuild_schema_index()
+            
             # Загрузка конфигурации JOIN
             self.join_config = json.loads(os.getenv("JOIN_CONFIG", "[]"))
             self.log(f"Загружены правила JOIN: {self.join_config}")
@@ -57,6 +128,8 @@ class VirtualFDWManager:
             self.log(f"Ошибка загрузки конфигурации: {str(e)}", error=True)
             self.connection_params = {}
             self.table_mapping = {}
+            self._schema_mapping = {}
+            self._rebuild_schema_index()
             self.join_config = []
     
     def save_env_config(self) -> None:
@@ -68,21 +141,34 @@ class VirtualFDWManager:
             # Читаем текущее содержимое файла
             current_content = {}
             if os.path.exists(env_path):
-                with open(env_path, 'r') as f:
-                    for line in f:
-                        if '=' in line:
-                            key, value = line.strip().split('=', 1)
-                            current_content[key] = value
+                for line in read_env_file(env_path).splitlines():
+                    if '=' in line:
+                        key, value = line.strip().split('=', 1)
+                        current_content[key] = value
             
             # Обновляем только нужные ключи
             current_content['CONNECTIONS'] = json.dumps(self.connection_params)
             current_content['TABLE_MAPPINGS'] = json.dumps(self.table_mapping)
+            current_content['SCHEMA_MAPPINGS'] = json.dumps(self._schema_mapping)
             current_content['JOIN_CONFIG'] = json.dumps(self.join_config)
             
-            # Записываем обновленное содержимое
-            with open(env_path, 'w') as f:
-                for key, value in current_content.items():
-                    f.write(f"{key}={value}\n")
+            # Записываем обновленное содержимое во временный файл и подменяем .env одной операцией:
+            # при сбое записи старый файл остается целым
+            tmp_path = f"{env_path}.tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    f.write("".join(f"{key}={value}\n" for key, value in current_content.items()))
+                    # Данные должны быть на диске до подмены, иначе после сбоя питания .env окажется пустым
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(env_path):
+                    # Права .env (например, 600 для паролей) переносятся на новый файл
+                    shutil.copymode(env_path, tmp_path)
+                os.replace(tmp_path, env_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            invalidate_env_cache()
             
             self.log(f"Успешно сохранено: CONNECTIONS={current_content['CONNECTIONS']}")
             self.log(f"Успешно сохранено: TABLE_MAPPINGS={current_content['TABLE_MAPPINGS']}")
@@ -105,6 +191,7 @@ class VirtualFDWManager:
         """Удаление подключения."""
         if name in self.connection_params:
             del self.connection_params[name]
+            self.remove_schema_mappings(name)
             self.save_env_config()
             self.log(f"Удалено подключение: {name}")
         else:
@@ -119,6 +206,36 @@ class VirtualFDWManager:
         self.save_env_config()
         self.log(f"Таблица {table} сопоставлена с подключением {connection}")
 
+    @property
+    def schema_mapping(self) -> Mapping[str, str]:
+        """Маппинг схем на подключения только для чтения: обратный индекс не рассинхронизируется."""
+        return MappingProxyType(self._schema_mapping)
+
+    def map_schema(self, schema: str, connection: str) -> None:
+        """Сопоставление схемы с подключением (без сохранения в .env)."""
+        self.unmap_schema(schema)
+        self._schema_mapping[schema] = connection
+        self._conn_to_schemas[connection].add(schema)
+
+    def unmap_schema(self, schema: str) -> None:
+        """Удаление маппинга схемы (без сохранения в .env)."""
+        connection = self._schema_mapping.pop(schema, None)
+        if connection is not None:
+            self._conn_to_schemas[connection].discard(schema)
+
+    def remove_schema_mappings(self, connection: str) -> List[str]:
+        """Удаляет маппинги всех схем подключения по обратному индексу; возвращает схемы."""
+        schemas = self._conn_to_schemas.pop(connection, set())
+        for schema in schemas:
+            self._schema_mapping.pop(schema, None)
+        return sorted(schemas)
+
+    def _rebuild_schema_index(self) -> None:
+        """Перестраивает обратный индекс маппинга схем после загрузки."""
+        self._conn_to_schemas = defaultdict(set)
+        for schema, connection in self._schema_mapping.items():
+            self._conn_to_schemas[connection].add(schema)
+
     def add_join_rule(self, tables: List[str], key: str, join_type: str = 'inner') -> None:
         """Добавление правила JOIN между таблицами."""
         if len(tables) < 2:
@@ -152,6 +269,11 @@ class VirtualFDWManager:
         if key not in self.connection_params:
             raise ValueError(f"Не найден ключ подключения: '{key}'")
         
+        # Открытое подключение используется повторно, если учетные данные не переданы явно
+        conn = self.connections.get(key)
+        if conn is not None and not conn.closed and user is None and password is None:
+            return conn
+        
         # Получаем учетные данные из AuthManager
         stored_user, stored_password = AuthManager.get_credentials(key)
         
@@ -172,6 +294,23 @@ class VirtualFDWManager:
             self.log(f"Ошибка подключения к {key}: {str(e)}", error=True)
             raise ConnectionError(f"Ошибка подключения к {key}: {str(e)}") from e
 
+    def clone(self) -> 'VirtualFDWManager':
+        """Копия менеджера с общей конфигурацией и собственными подключениями."""
+        manager = copy.copy(self)
+        manager.connections = {}
+        return manager
+
+    @contextmanager
+    def session(self):
+        """Держит подключения открытыми между вызовами execute_query внутри блока with."""
+        self._session_depth += 1
+        try:
+            yield self
+        finally:
+            self._session_depth -= 1
+            if not self._session_depth:
+                self._close_connections()
+
     def execute_query(self, query: str) -> Tuple[pd.DataFrame, float]:
         """Выполнение SQL запроса с поддержкой JOIN между разными БД."""
         start_time = time.time()
@@ -262,9 +401,10 @@ class VirtualFDWManager:
             self.log(error_msg, error=True)
             raise RuntimeError(error_msg) from e
         finally:
-            self._close_connections()
+            if not self._session_depth:
+                self._close_connections()
 
-    def _resolve_table_mappings(self, parsed: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    def _resolve_table_mappings(self, parsed: Dict[str, Any]) -> Dict[str, TableInfo]:
         """Определение подключений для таблиц в запросе."""
         table_info = {}
         
@@ -296,24 +436,23 @@ class VirtualFDWManager:
             if alias is None:
                 alias = table_name
             
-            table_info[full_table] = {
-                'connection': connection_name,
-                'schema': schema,
-                'table_name': table_name,
-                'alias': alias,
-                'columns': []
-            }
+            table_info[full_table] = TableInfo(
+                connection=connection_name,
+                schema=schema,
+                table_name=table_name,
+                alias=alias
+            )
         
         return table_info
 
-    def _group_tables_by_connection(self, table_info: Dict[str, Dict[str, str]]) -> Dict[str, List[str]]:
+    def _group_tables_by_connection(self, table_info: Dict[str, TableInfo]) -> Dict[str, List[str]]:
         """Группировка таблиц по подключениям."""
         conn_groups = defaultdict(list)
         for table, info in table_info.items():
-            conn_groups[info['connection']].append(table)
+            conn_groups[info.connection].append(table)
         return conn_groups
 
-    def _fetch_data(self, parsed: Dict[str, Any], table_info: Dict[str, Dict[str, str]], 
+    def _fetch_data(self, parsed: Dict[str, Any], table_info: Dict[str, TableInfo], 
                    conn_groups: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
         """Загрузка данных из БД с учетом JOIN внутри одного подключения."""
         dfs = {}
@@ -344,7 +483,7 @@ class VirtualFDWManager:
                 
         return False
 
-    def _execute_db_join(self, parsed: Dict[str, Any], table_info: Dict[str, Dict[str, str]], 
+    def _execute_db_join(self, parsed: Dict[str, Any], table_info: Dict[str, TableInfo], 
                         conn_name: str, tables_in_conn: List[str], 
                         join_rules: List[Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
         """Выполняет JOIN на стороне БД."""
@@ -357,20 +496,20 @@ class VirtualFDWManager:
         column_aliases = {}
         for table in tables_in_conn:
             info = table_info[table]
-            columns = self._get_columns_for_table(parsed['columns'], info['alias'], table)
+            columns = self._get_columns_for_table(parsed['columns'], info.alias, table)
             if columns == ['*']:
-                select_parts.append(f"{info['alias']}.*")
+                select_parts.append(f"{info.alias}.*")
             else:
                 for col in columns:
-                    col_alias = f"{info['alias']}_{col}"
-                    select_parts.append(f"{info['alias']}.{col} AS {col_alias}")
-                    column_aliases[(info['alias'], col)] = col_alias
+                    col_alias = f"{info.alias}_{col}"
+                    select_parts.append(f"{info.alias}.{col} AS {col_alias}")
+                    column_aliases[(info.alias, col)] = col_alias
         
         # Формируем FROM и JOIN части
-        from_parts = [f"{base_info['schema']}.{base_info['table_name']} AS {base_info['alias']}"]
+        from_parts = [f"{base_info.schema}.{base_info.table_name} AS {base_info.alias}"]
         for table in tables_in_conn[1:]:
             info = table_info[table]
-            from_parts.append(f"JOIN {info['schema']}.{info['table_name']} AS {info['alias']}")
+            from_parts.append(f"JOIN {info.schema}.{info.table_name} AS {info.alias}")
         
         # Получаем условия JOIN из правил
         join_conditions = []
@@ -380,8 +519,8 @@ class VirtualFDWManager:
                     if rule['tables'][i] in tables_in_conn:
                         left_table = rule['tables'][0]
                         right_table = rule['tables'][i]
-                        left_alias = table_info[left_table]['alias']
-                        right_alias = table_info[right_table]['alias']
+                        left_alias = table_info[left_table].alias
+                        right_alias = table_info[right_table].alias
                         join_conditions.append(f"{left_alias}.{rule['key']} = {right_alias}.{rule['key']}")
         
         # Собираем полный запрос
@@ -393,7 +532,7 @@ class VirtualFDWManager:
         where_conditions = []
         for table in tables_in_conn:
             info = table_info[table]
-            table_where = self._extract_table_where(parsed.get('where', ''), info['alias'])
+            table_where = self._extract_table_where(parsed.get('where', ''), info.alias)
             if table_where:
                 where_conditions.append(table_where)
         
@@ -413,12 +552,12 @@ class VirtualFDWManager:
             # Выбираем колонки относящиеся к текущей таблице
             table_cols = []
             if parsed['columns'] == ['*']:
-                prefix = info['alias'] + '_'
+                prefix = info.alias + '_'
                 table_cols = [col for col in df_joined.columns if col.startswith(prefix)]
             else:
-                table_cols = [column_aliases.get((info['alias'], col)) 
-                            for col in self._get_columns_for_table(parsed['columns'], info['alias'], table)
-                            if (info['alias'], col) in column_aliases]
+                table_cols = [column_aliases.get((info.alias, col)) 
+                            for col in self._get_columns_for_table(parsed['columns'], info.alias, table)
+                            if (info.alias, col) in column_aliases]
                 table_cols = [col for col in table_cols if col]
             
             df_table = df_joined[table_cols].copy()
@@ -429,14 +568,14 @@ class VirtualFDWManager:
                                 for col in df_table.columns]
             
             # Добавляем префикс алиаса таблицы к именам колонок
-            df_table.columns = [f"{info['alias']}.{col}" for col in df_table.columns]
+            df_table.columns = [f"{info.alias}.{col}" for col in df_table.columns]
             
             dfs[table] = df_table
-            info['columns'] = df_table.columns.tolist()
+            info.columns = df_table.columns.tolist()
         
         return dfs
 
-    def _execute_client_join(self, parsed: Dict[str, Any], table_info: Dict[str, Dict[str, str]], 
+    def _execute_client_join(self, parsed: Dict[str, Any], table_info: Dict[str, TableInfo], 
                            conn_name: str, tables_in_conn: List[str], 
                            join_rules: List[Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
         """Выполняет отдельные запросы и JOIN на стороне клиента."""
@@ -446,13 +585,13 @@ class VirtualFDWManager:
             info = table_info[full_table]
             
             # Определяем условия WHERE для текущей таблицы
-            table_where = self._extract_table_where(parsed.get('where', ''), info['alias'])
+            table_where = self._extract_table_where(parsed.get('where', ''), info.alias)
             
             # Формируем SQL запрос
-            columns = self._get_columns_for_table(parsed['columns'], info['alias'], full_table)
+            columns = self._get_columns_for_table(parsed['columns'], info.alias, full_table)
             cols = ', '.join(columns) if columns and columns != ['*'] else '*'
             
-            sql = f"SELECT {cols} FROM {info['schema']}.{info['table_name']}"
+            sql = f"SELECT {cols} FROM {info.schema}.{info.table_name}"
             
             # Добавляем условия WHERE, если есть
             conditions = []
@@ -470,14 +609,14 @@ class VirtualFDWManager:
                             other_info = table_info[other_table]
                             other_df = dfs[other_table]
                             
-                            other_col = f"{other_info['alias']}.{join_key}"
+                            other_col = f"{other_info.alias}.{join_key}"
                             if other_col in other_df.columns:
                                 values = other_df[other_col].unique()
                                 join_params.extend(values.tolist())
             
             # Если есть JOIN условия, добавляем их в запрос
             if join_params and join_key:
-                join_condition = f"{info['alias']}.{join_key} IN %s"
+                join_condition = f"{info.alias}.{join_key} IN %s"
                 conditions.append(join_condition)
             
             if conditions:
@@ -486,7 +625,7 @@ class VirtualFDWManager:
             self.log(f"Выполняем запрос к {full_table}: {sql}")
             
             # Выполняем запрос
-            with self.get_connection(info['connection']).cursor() as cur:
+            with self.get_connection(info.connection).cursor() as cur:
                 if join_params:
                     params = (tuple(join_params),)
                     cur.execute(sql, params)
@@ -495,13 +634,13 @@ class VirtualFDWManager:
                 
                 df = pd.DataFrame(cur.fetchall(), columns=[desc[0] for desc in cur.description])
                 # Добавляем префикс алиаса
-                df.columns = [f"{info['alias']}.{col}" for col in df.columns]
-                info['columns'] = df.columns.tolist()
+                df.columns = [f"{info.alias}.{col}" for col in df.columns]
+                info.columns = df.columns.tolist()
                 dfs[full_table] = df
         
         return dfs
 
-    def _merge_results(self, parsed: Dict[str, Any], table_info: Dict[str, Dict[str, str]], 
+    def _merge_results(self, parsed: Dict[str, Any], table_info: Dict[str, TableInfo], 
                       dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         """Объединение результатов из разных подключений."""
         if len(dfs) == 1:
@@ -543,8 +682,8 @@ class VirtualFDWManager:
                             common_table = common_tables[0]
                             join_key = rule['key']
                             
-                            left_keys = [f"{table_info[common_table]['alias']}.{join_key}"]
-                            right_keys = [f"{table_info[table]['alias']}.{join_key}"]
+                            left_keys = [f"{table_info[common_table].alias}.{join_key}"]
+                            right_keys = [f"{table_info[table].alias}.{join_key}"]
                             
                             # Проверяем наличие ключей в данных
                             if (all(k in merged.columns for k in left_keys) and 
@@ -627,15 +766,15 @@ class VirtualFDWManager:
 
         # Разбор JOIN
         join_pattern = re.compile(
-            r'\b(?:INNER\s+JOIN|LEFT\s+JOIN|RIGHT\s+JOIN|FULL\s+JOIN|CROSS\s+JOIN|JOIN)\b\s+(\w+\.\w+|\w+)(?:\s+AS\s+)?(\w+)?\s+ON\s+([^)]+)',
+            r'\b(INNER\s+JOIN|LEFT\s+JOIN|RIGHT\s+JOIN|FULL\s+JOIN|CROSS\s+JOIN|JOIN)\b\s+(\w+\.\w+|\w+)(?:\s+AS\s+)?(\w+)?\s+ON\s+([^)]+)',
             re.IGNORECASE
         )
         
         join_matches = list(join_pattern.finditer(normalized_query))
         for match in join_matches:
-            table_name = match.group(1)
-            alias = match.group(2)
-            condition = match.group(3)
+            table_name = match.group(2)
+            alias = match.group(3)
+            condition = match.group(4)
             
             # Добавляем таблицу в список
             parsed['tables'].add(table_name)
@@ -645,11 +784,12 @@ class VirtualFDWManager:
                 parsed['aliases'][alias] = table_name
                 
             # Сохраняем условие JOIN
-            parsed['joins'].append({
-                'table': table_name,
-                'alias': alias,
-                'condition': condition.strip()
-            })
+            parsed['joins'].append(JoinSpec(
+                table=table_name,
+                alias=alias,
+                condition=condition.strip(),
+                kind=' '.join(match.group(1).upper().split())
+            ))
         
         # Находим начало WHERE
         where_idx = query_lower.find('where', from_end)
@@ -661,11 +801,9 @@ class VirtualFDWManager:
             where_clause = normalized_query[where_idx+5:where_end].strip()
             
             # Удаляем лишние части (GROUP BY, ORDER BY и т.д.)
-            for terminator in ['group by', 'order by', 'limit']:
-                pos = where_clause.lower().find(terminator)
-                if pos != -1:
-                    where_clause = where_clause[:pos].strip()
-                    break
+            terminator = _WHERE_TERMINATORS_RE.search(where_clause)
+            if terminator:
+                where_clause = where_clause[:terminator.start()].strip()
             
             # Нормализуем имена таблиц в условии WHERE
             where_clause = re.sub(r'(\b\w+\b\.\b\w+\b\.\b\w+\b)', lambda m: m.group(0).replace('.', '_'), where_clause)
@@ -694,7 +832,7 @@ class VirtualFDWManager:
             alias = None
             if len(parts) > 1:
                 # Пропускаем "AS"
-                if parts[1].lower() == 'as' and len(parts) > 2:
+                if parts[1] in _AS_KEYWORD and len(parts) > 2:
                     alias = parts[2]
                 else:
                     alias = parts[1]
@@ -703,7 +841,7 @@ class VirtualFDWManager:
             if alias:
                 # Удаляем кавычки и игнорируем ключевые слова
                 alias = alias.strip('"\'')
-                if alias.lower() not in ['inner', 'outer', 'left', 'right', 'full', 'cross']:
+                if len(alias) > _JOIN_KEYWORD_MAX_LEN or alias.lower() not in _JOIN_KEYWORDS:
                     parsed['aliases'][alias] = table_name
 
         # Условие WHERE
@@ -712,12 +850,10 @@ class VirtualFDWManager:
             where_clause = normalized_query[where_idx+5:where_end].strip()
             
             # Удаляем лишние части (GROUP BY, ORDER BY и т.д.)
-            for terminator in ['group by', 'order by', 'limit']:
-                pos = where_clause.lower().find(terminator)
-                if pos != -1:
-                    where_clause = where_clause[:pos].strip()
-                    break
-                    
+            terminator = _WHERE_TERMINATORS_RE.search(where_clause)
+            if terminator:
+                where_clause = where_clause[:terminator.start()].strip()
+
             parsed['where'] = where_clause
 
         return parsed
@@ -725,31 +861,10 @@ class VirtualFDWManager:
     @staticmethod
     def _split_columns(columns_str: str) -> List[str]:
         """Надежный парсер колонок без регулярных выражений."""
-        parts = []
-        current = []
-        in_quotes = False
-        in_parentheses = 0
-        
-        for char in columns_str:
-            if char == "'" or char == '"':
-                in_quotes = not in_quotes
-            elif char == '(' and not in_quotes:
-                in_parentheses += 1
-            elif char == ')' and not in_quotes and in_parentheses > 0:
-                in_parentheses -= 1
-            elif char == ',' and not in_quotes and in_parentheses == 0:
-                parts.append(''.join(current).strip())
-                current = []
-                continue
-                
-            current.append(char)
-        
-        if current:
-            parts.append(''.join(current).strip())
-        
-        return parts
+        buf = columns_str.encode('utf-8')
+        return [buf[s:e].decode('utf-8').strip() for s, e in split_columns_spans(buf)]
 
-    def _get_applicable_join_rules(self, table_info: Dict[str, Dict[str, str]]) -> List[Dict[str, Any]]:
+    def _get_applicable_join_rules(self, table_info: Dict[str, TableInfo]) -> List[Dict[str, Any]]:
         """Возвращает JOIN правила, применимые к текущим таблицам."""
         applicable_rules = []
         tables = list(table_info.keys())
@@ -768,7 +883,7 @@ class VirtualFDWManager:
         
         # Упрощенная реализация: берем только условия с указанием алиаса таблицы
         conditions = []
-        tokens = where_clause.split(' AND ')
+        tokens = self._split_where_conditions(where_clause, _AND_SEPARATOR)
         
         for token in tokens:
             token = token.strip()
@@ -783,35 +898,33 @@ class VirtualFDWManager:
 
     def _get_columns_for_table(self, columns: List[str], table_alias: str, full_table: str) -> List[str]:
         """Определяет какие колонки запрашивать для конкретной таблицы."""
+        if '*' in columns:
+            return ['*']
+        
         result = []
         
         for col in columns:
-            if col == '*':
-                return ['*']
-                
-            if '.' in col:
-                parts = col.split('.')
-                if len(parts) == 2 and parts[0] == table_alias:
-                    result.append(parts[1])
-                elif len(parts) == 3 and f"{parts[0]}.{parts[1]}" == full_table:
-                    result.append(parts[2])
-            else:
+            # Квалификатор - все до последней точки: алиас или схема.таблица
+            qualifier, _, name = col.rpartition('.')
+            if not qualifier:
                 # Колонки без указания таблицы добавляем для всех таблиц
                 result.append(col)
+            elif qualifier == table_alias or qualifier == full_table:
+                result.append(name)
         
-        return result if result else ['*']
+        return result or ['*']
 
-    def _get_join_keys(self, parsed: Dict[str, Any], table_info: Dict[str, Dict[str, str]], 
+    def _get_join_keys(self, parsed: Dict[str, Any], table_info: Dict[str, TableInfo], 
                       current_table: str, available_columns: List[str]) -> Optional[Dict[str, List[str]]]:
         """Определяет ключи для объединения таблиц."""
         join_keys = {'left_keys': [], 'right_keys': []}
-        current_alias = table_info[current_table]['alias']
+        current_alias = table_info[current_table].alias
         
         for join in parsed.get('joins', []):
-            if join['table'] != current_table and join.get('alias') != current_alias:
+            if join.table != current_table and join.alias != current_alias:
                 continue
                 
-            condition = join['condition']
+            condition = join.condition
             comparisons = [c.strip() for c in re.split(r'\bAND\b|\bOR\b', condition, flags=re.IGNORECASE) if c.strip()]
             
             for comp in comparisons:
@@ -832,101 +945,141 @@ class VirtualFDWManager:
 
     def _prepare_where_condition(self, where_clause: str, available_columns: List[str]) -> str:
         """Подготавливает условие WHERE для использования в pandas."""
-        # Создаем маппинг для замены имен колонок (удаляем префиксы таблиц)
+        # Создаем маппинг для замены имен колонок (полное имя и имя без префикса таблицы)
         column_mapping = {}
         for col in available_columns:
             if '.' in col:
-                # Сохраняем полное имя и имя без префикса таблицы
                 column_mapping[col] = col
                 column_mapping[col.split('.')[-1]] = col
         
-        # Заменяем имена в условии WHERE на полные имена колонок
-        for original, new in sorted(column_mapping.items(), key=lambda x: -len(x[0])):
-            where_clause = re.sub(
-                rf'(?<!\w){re.escape(original)}(?!\w)',
-                new,
-                where_clause
-            )
-        
-        # Удаляем префиксы таблиц из имен колонок
-        where_clause = re.sub(r'\b\w+\.(\w+)\b', r'\1', where_clause)
-        
-        # Преобразуем SQL в pandas-синтаксис
-        where_clause = (
-            where_clause
-            .replace('=', '==')
-            .replace('<>', '!=')
-            .replace('IS NULL', '.isna()')
-            .replace('IS NOT NULL', '.notna()')
-            .replace("'", '"')
-        )
+        # Один проход по токенам: имена колонок, операторы и строки переписываются сразу
+        tokens = [(m.lastgroup, m.group()) for m in SQL_TOKEN_RE.finditer(where_clause)]
+        result = []
+        i = 0
+        while i < len(tokens):
+            kind, text = tokens[i]
+            i += 1
+            
+            if kind == 'ident':
+                if text.upper() == 'IS':
+                    # IS NULL / IS NOT NULL -> .isna() / .notna()
+                    words = [t.upper() for k, t in tokens[i:i + 4] if k != 'ws']
+                    if words[:1] == ['NULL']:
+                        result.append('.isna()')
+                        i = self._skip_words(tokens, i, 1)
+                        continue
+                    if words[:2] == ['NOT', 'NULL']:
+                        result.append('.notna()')
+                        i = self._skip_words(tokens, i, 2)
+                        continue
+                
+                if text.upper() in _PANDAS_KEYWORDS:
+                    result.append(text.lower())
+                    continue
+                
+                mapped = column_mapping.get(text) or column_mapping.get(text.split('.')[-1])
+                if mapped:
+                    result.append(f"`{mapped}`")
+                else:
+                    # Удаляем префиксы таблиц у неизвестных имен
+                    result.append(text.split('.')[-1])
+            elif kind == 'op':
+                result.append(_PANDAS_OPERATORS.get(text, text))
+            elif kind == 'string':
+                value = text[1:-1].replace("''", "'")
+                result.append('"' + value.replace('"', '\\"') + '"')
+            else:
+                result.append(text)
         
-        return where_clause
+        return ''.join(result)
+
+    @staticmethod
+    def _skip_words(tokens: List[Tuple[str, str]], pos: int, count: int) -> int:
+        """Возвращает позицию токена после count слов, начиная с pos."""
+        while count:
+            if tokens[pos][0] != 'ws':
+                count -= 1
+            pos += 1
+        return pos
     
     def _apply_where_manually(self, df: pd.DataFrame, where_condition: str) -> pd.DataFrame:
         """Применяет условие WHERE вручную, если query() не сработал."""
-        # Удаляем префиксы таблиц из имен колонок
-        where_condition = re.sub(r'\b\w+\.(\w+)\b', r'\1', where_condition)
-        
-        conditions = [c.strip() for c in where_condition.split(' AND ')]
-        mask = pd.Series(True, index=df.index)
-        
-        for cond in conditions:
-            try:
-                if '==' in cond:
-                    col, val = cond.split('==', 1)
-                    col = col.strip()
-                    val = val.strip().strip('"\'')
-                    mask = mask & (df[col].astype(str) == val)
-                elif '!=' in cond:
-                    col, val = cond.split('!=', 1)
-                    col = col.strip()
-                    val = val.strip().strip('"\'')
-                    mask = mask & (df[col].astype(str) != val)
-                elif '.isna()' in cond:
-                    col = cond.replace('.isna()', '').strip()
-                    mask = mask & df[col].isna()
-                elif '.notna()' in cond:
-                    col = cond.replace('.notna()', '').strip()
-                    mask = mask & df[col].notna()
-            except Exception as e:
-                self.log(f"Ошибка обработки условия {cond}: {str(e)}", error=True)
-                continue
-        
-        return df[mask]
+        return df.iloc[np.flatnonzero(self._where_mask(df, where_condition))]
 
-    @staticmethod
-    def _split_where_conditions(where_clause: str) -> List[str]:
-        """Надежное разбиение условий WHERE без сложных регулярных выражений."""
-        conditions = []
-        current = []
-        in_quotes = False
-        quote_char = None
-        
-        for char in where_clause:
-            if char in ['"', "'"]:
-                if in_quotes and char == quote_char:
-                    in_quotes = False
-                    quote_char = None
-                elif not in_quotes:
-                    in_quotes = True
-                    quote_char = char
-                current.append(char)
-            elif not in_quotes:
-                if char == '.' and current and current[-1] != ' ':
-                    # Проверка на AND/OR
-                    last_chars = ''.join(current[-4:]).lower()
-                    if last_chars.endswith(' and') or last_chars.endswith(' or '):
-                        condition = ''.join(current[:-4]).strip()
-                        if condition:
-                            conditions.append(condition)
-                        current = []
-                current.append(char)
+    def _where_mask(self, df: pd.DataFrame, where_condition: str) -> np.ndarray:
+        """Маска строк для условия с OR, AND и скобками; AND связывает сильнее OR, как в SQL."""
+        mask = np.zeros(len(df), dtype=bool)
+        for group in self._split_where_conditions(where_condition, _OR_SEPARATOR):
+            np.logical_or(mask, self._and_mask(df, group), out=mask)
+        return mask
+
+    def _and_mask(self, df: pd.DataFrame, where_condition: str) -> np.ndarray:
+        """Маска строк, для которых выполнены все условия, связанные AND."""
+        mask = np.ones(len(df), dtype=bool)
+        for cond in self._split_where_conditions(where_condition, _AND_SEPARATOR):
+            inner = strip_outer_parens(cond)
+            if inner != cond:
+                np.logical_and(mask, self._where_mask(df, inner), out=mask)
             else:
-                current.append(char)
+                np.logical_and(mask, self._condition_mask(df, cond), out=mask)
+        return mask
+
+    def _condition_mask(self, df: pd.DataFrame, cond: str) -> np.ndarray:
+        """Маска одного сравнения; условие, которое не удалось разобрать, не выбирает строк."""
+        try:
+            if cond.endswith('.isna()'):
+                return self._to_mask(df[cond[:-len('.isna()')].strip().strip('`')].isna())
+            if cond.endswith('.notna()'):
+                return self._to_mask(df[cond[:-len('.notna()')].strip().strip('`')].notna())
+            
+            # Первый оператор вне строковых литералов
+            op = next((t for t in SQL_TOKEN_RE.finditer(cond) if t.lastgroup == 'op'), None)
+            if op is not None and op.group() in ('==', '!='):
+                col = cond[:op.start()].strip().strip('`')
+                val = cond[op.end():].strip().strip('"\'')
+                lhs, rhs = self._comparison_operands(df[col], val)
+                result = lhs == rhs if op.group() == '==' else lhs != rhs
+                # NULL не равен и не "не равен" ничему, как в SQL
+                return self._to_mask(result & df[col].notna())
+            
+            self.log(f"Условие не поддерживается при ручной фильтрации: {cond}", error=True)
+        except Exception as e:
+            self.log(f"Ошибка обработки условия {cond}: {str(e)}", error=True)
+        return np.zeros(len(df), dtype=bool)
+
+    @staticmethod
+    def _to_mask(condition: pd.Series) -> np.ndarray:
+        """Преобразует результат сравнения в булев массив (NA считается ложью)."""
+        return condition.to_numpy(dtype=bool, na_value=False)
+
+    @staticmethod
+    def _comparison_operands(series: pd.Series, val: str) -> Tuple[Any, Any]:
+        """Приводит литерал к типу колонки; строковое сравнение - только как запасной вариант."""
+        dtype = series.dtype
+        rhs = None
+        try:
+            if pd.api.types.is_bool_dtype(dtype):
+                rhs = _BOOL_LITERALS.get(val.lower())
+            elif pd.api.types.is_integer_dtype(dtype):
+                rhs = int(val)
+            elif pd.api.types.is_float_dtype(dtype):
+                rhs = float(val)
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                rhs = pd.Timestamp(val)
+                tz = getattr(dtype, 'tz', None)
+                if tz is not None and rhs.tzinfo is None:
+                    rhs = rhs.tz_localize(tz)
+        except (ValueError, TypeError):
+            rhs = None
         
-        if current:
-            conditions.append(''.join(current).strip())
+        if rhs is None:
+            return series.astype(str), val
+        return series, rhs
+
+    @staticmethod
+    def _split_where_conditions(where_clause: str, separators: Optional[FrozenSet[str]] = None) -> List[str]:
+        """Разбиение условий WHERE по AND/OR верхнего уровня, вне строк, скобок и BETWEEN ... AND."""
+        conditions = [where_clause[s:e].strip() for s, e in split_where_spans(where_clause, separators)]
         
         # Фильтрация пустых условий
         return [c for c in conditions if c]
@@ -1,16 +1,29 @@
+import time
 import keyring
 
 class SecurityManager:
+    # Кеш ответов keyring: ключ -> (момент чтения, значение)
+    _cache = {}
+    _TTL = 30.0
+
     @staticmethod
     def store_password(key, password):
         keyring.set_password("hfpoint", key, password)
-    
+        SecurityManager._cache.pop(key, None)
+
     @staticmethod
     def get_password(key):
-        return keyring.get_password("hfpoint", key)
-    
+        cached = SecurityManager._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < SecurityManager._TTL:
+            return cached[1]
+        password = keyring.get_password("hfpoint", key)
+        SecurityManager._cache[key] = (time.monotonic(), password)
+        return password
+
     @staticmethod
     def clear_credentials(connection_name):
+        SecurityManager._cache.pop(f"{connection_name}_user", None)
+        SecurityManager._cache.pop(f"{connection_name}_pass", None)
         try:
             keyring.delete_password("hfpoint", f"{connection_name}_user")
             keyring.delete_password("hfpoint", f"{connection_name}_pass")
@@ -22,13 +35,20 @@ class AuthManager:
     def save_credentials(cls, connection_name, user, password):
         SecurityManager.store_password(f"{connection_name}_user", user)
         SecurityManager.store_password(f"{connection_name}_pass", password)
-    
+
     @classmethod
     def get_credentials(cls, connection_name):
         user = SecurityManager.get_password(f"{connection_name}_user")
         password = SecurityManager.get_password(f"{connection_name}_pass")
         return user, password
-    
+
+    @classmethod
+    def get_credentials_many(cls, connection_names, executor=None):
+        # Каждое чтение keyring - отдельный вызов ОС; с executor они идут параллельно
+        if executor is not None and len(connection_names) > 1:
+            return dict(zip(connection_names, executor.map(cls.get_credentials, connection_names)))
+        return {name: cls.get_credentials(name) for name in connection_names}
+
     @classmethod
     def delete_credentials(cls, connection_name):
         SecurityManager.clear_credentials(connection_name)
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Сканеры SQL-текста.
+
+Функции возвращают границы фрагментов (start, end). split_columns_spans
+работает с текстом в UTF-8 и возвращает границы в байтах: разделители -
+ASCII, поэтому срез по ним всегда попадает на границу символа.
+split_where_spans разбирает строку токенами SQL_TOKEN_RE.
+"""
+import re
+from typing import FrozenSet, List, Optional, Tuple
+
+
+# Коды символов для побайтового сканирования SQL
+_QUOTE = ord("'")
+_DQUOTE = ord('"')
+_LPAREN = ord('(')
+_RPAREN = ord(')')
+_COMMA = ord(',')
+# Ключевые слова, разделяющие условия WHERE
+_CONDITION_SEPARATORS = frozenset({'AND', 'OR'})
+
+# Токены условия WHERE
+SQL_TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"[^"]*")
+  | (?P<ident>[^\W\d]\w*(?:\.\w+)*)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<op><>|!=|>=|<=|==|=|<|>)
+  | (?P<ws>\s+)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+def split_columns_spans(buf: bytes) -> List[Tuple[int, int]]:
+    """Границы колонок SELECT, разделенных запятыми вне кавычек и скобок."""
+    spans = []
+    start = 0
+    depth = 0
+    quote = 0
+
+    for i, b in enumerate(buf):
+        if quote:
+            if b == quote:
+                quote = 0
+        elif b == _QUOTE or b == _DQUOTE:
+            quote = b
+        elif b == _LPAREN:
+            depth += 1
+        elif b == _RPAREN:
+            if depth > 0:
+                depth -= 1
+        elif b == _COMMA and depth == 0:
+            spans.append((start, i))
+            start = i + 1
+
+    if start < len(buf):
+        spans.append((start, len(buf)))
+
+    return spans
+
+
+def split_where_spans(where_clause: str,
+                      separators: Optional[FrozenSet[str]] = None) -> List[Tuple[int, int]]:
+    """Границы условий WHERE, разделенных separators (по умолчанию AND/OR) верхнего уровня."""
+    separators = separators or _CONDITION_SEPARATORS
+    spans = []
+    start = 0
+    depth = 0
+    between = False  # AND после BETWEEN - часть диапазона, а не разделитель
+
+    for token in SQL_TOKEN_RE.finditer(where_clause):
+        kind = token.lastgroup
+        if kind == 'other':
+            text = token.group()
+            if text == '(':
+                depth += 1
+            elif text == ')' and depth > 0:
+                depth -= 1
+        elif kind == 'ident' and depth == 0:
+            word = token.group().upper()
+            if word == 'BETWEEN':
+                between = True
+            elif word == 'AND' and between:
+                between = False
+            elif word in separators:
+                spans.append((start, token.start()))
+                start = token.end()
+
+    spans.append((start, len(where_clause)))
+    return spans
+
+
+def strip_outer_parens(condition: str) -> str:
+    """Снимает скобки, охватывающие условие целиком."""
+    condition = condition.strip()
+    while condition.startswith('(') and condition.endswith(')'):
+        depth = 0
+        for token in SQL_TOKEN_RE.finditer(condition):
+            if token.lastgroup != 'other':
+                continue
+            if token.group() == '(':
+                depth += 1
+            elif token.group() == ')':
+                depth -= 1
+                if depth == 0 and token.end() < len(condition):
+                    # Первая скобка закрывается раньше конца: (a) OR (b)
+                    return condition
+        condition = condition[1:-1].strip()
+    return condition
@@ -273,24 +273,19 @@ class EditConnectionWindow(tk.Toplevel):
             if self.connection_name in self.fdw.connection_params:
                 del self.fdw.connection_params[self.connection_name]
         
-        self.fdw.connection_params[name] = params
-
         # Сохраняем параметры подключения
         self.fdw.connection_params[name] = params
-        
-        # Всегда сохраняем учетные данные в AuthManager
-        AuthManager.save_credentials(name, user, password)
-        
-        # Обновляем кеш в VirtualFDWManager
-        if hasattr(self.fdw, 'saved_credentials'):
-            self.fdw.saved_credentials[name] = {
-                'user': user,
-                'password': password
-            }
 
         # Сохранение учетных данных
         if self.save_pass_var.get():
             AuthManager.save_credentials(name, user, password)
+            
+            # Обновляем кеш в VirtualFDWManager
+            if hasattr(self.fdw, 'saved_credentials'):
+                self.fdw.saved_credentials[name] = {
+                    'user': user,
+                    'password': password
+                }
         else:
             AuthManager.delete_credentials(name)
 
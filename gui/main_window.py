@@ -2,17 +2,73 @@ from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 import os
+import re
+import weakref
+from collections import deque
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
 import pandas as pd
-from hfpoint.core.fdw_manager import VirtualFDWManager
+from hfpoint.core.fdw_manager import VirtualFDWManager, read_env_file
 from hfpoint.core.security import AuthManager
 from .windows import TableMappingWindow, JoinRulesWindow, SchemaMappingWindow
 from .dialogs_main import EditConnectionWindow, ConnectionWindow
-from .widgets import SQLText
+from .widgets import SQLText, INSERT_ROWS_TCL, INSERT_ITEMS_TCL, insert_rows
 import uuid
 from icon_manager import IconManager
 
+# Copy-on-Write: копии DataFrame не дублируют данные до первого изменения (в pandas 3 включен всегда)
+if int(pd.__version__.split('.')[0]) < 3:
+    try:
+        pd.options.mode.copy_on_write = True
+    except pd.errors.OptionError:
+        # В pandas до 1.5 такой опции нет
+        pass
+
+try:
+    # Потоковая запись xlsx; без xlsxwriter экспорт идет через to_excel pandas
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+
+# Сколько строк результата вставлять в Treeview за один раз
+RESULT_PAGE_SIZE = 200
+# Период опроса фоновых задач, мс
+FUTURE_POLL_MS = 50
+# Автоширина колонок: по скольким строкам считать, предел в символах, пикселей на символ и отступ
+COLUMN_SAMPLE_ROWS = 1000
+COLUMN_MAX_CHARS = 40
+COLUMN_CHAR_PX = 7
+COLUMN_PAD_PX = 20
+# Сколько вкладок держать заполненными; строки остальных удаляются и выводятся заново при открытии
+MAX_LIVE_TABS = 10
+# Задержка пересчета ячейки под курсором при движении мыши, мс
+HOVER_DELAY_MS = 30
+# Tcl-процедура, возвращающая значения одного столбца всех строк Treeview за один вызов
+COLUMN_VALUES_PROC = 'hfpoint_column_values'
+COLUMN_VALUES_TCL = ('proc ::%s {tree column} {set acc {}; '
+                     'foreach iid [$tree children {}] {lappend acc [$tree set $iid $column]}; '
+                     'return $acc}' % COLUMN_VALUES_PROC)
+# Tcl-процедура, собирающая выделенные строки Treeview в текст с табуляциями целиком на стороне Tcl
+SELECTION_TEXT_PROC = 'hfpoint_selection_text'
+SELECTION_TEXT_TCL = ('proc ::%s {tree} {set acc {}; '
+                      'foreach iid [$tree selection] {lappend acc [join [$tree item $iid -values] \\t]}; '
+                      'return [join $acc \\n]}' % SELECTION_TEXT_PROC)
+# Запрос только на чтение: SELECT без INTO; такие запросы пакета можно выполнять параллельно
+READ_ONLY_QUERY_RE = re.compile(r'\s*select\b(?!.*\binto\b)', re.IGNORECASE | re.DOTALL)
+# Потоков в общем пуле: пакетные запросы, чтение keyring и подключения при старте
+POOL_WORKERS = 8
+# Сколько строк плана EXPLAIN выводить за один проход цикла Tk
+EXPLAIN_CHUNK_LINES = 500
+# Сколько последних строк хранить в консоли лога
+LOG_MAX_LINES = 5000
+# Сколько строк переводить в значения Excel за один раз при потоковой записи
+EXPORT_CHUNK_ROWS = 10000
+# Сколько значений столбца добавлять в буфер обмена за один проход цикла Tk
+COPY_CHUNK_ROWS = 2000
+
 
 class FDWGUI(tk.Tk):
     def __init__(self):
@@ -25,49 +81,119 @@ class FDWGUI(tk.Tk):
         self.title("HF-Point")
         self.geometry("1100x700")
         env_path = os.path.abspath('.env')
-        if not os.path.exists(env_path):
-            with open(env_path, 'w') as f:
+        # Режим 'x' создает файл только если его нет - одной атомарной операцией
+        try:
+            with open(env_path, 'x') as f:
                 f.write("CONNECTIONS={}\nMAPPINGS={}\n")
+        except FileExistsError:
+            pass
         
         self.fdw = VirtualFDWManager()
         self.current_data = None
         self.query_results = {}
         self.current_tree = None
+        self._row_loaders = {}  # Догрузка строк для Treeview с частичным выводом
+        self._scroll_hooked = weakref.WeakSet()  # Treeview с уже перехваченным yscrollcommand
+        self._live_tabs = deque()  # Заполненные вкладки в порядке заполнения
+        # Состояние контекстного меню по Treeview результатов; запись исчезает вместе с уничтоженным
+        # виджетом, поэтому значения не должны ссылаться на сам Treeview (меню хранится по имени)
+        self._tree_state = weakref.WeakKeyDictionary()
+        self._hover_after_id = None   # Отложенный пересчет ячейки под курсором
+        self._column_copy_id = None   # Следующая порция копируемого столбца
+        # Сообщения лога, ожидающие вывода в консоль; больше LOG_MAX_LINES все равно не будет показано
+        self._log_buf = deque(maxlen=LOG_MAX_LINES)
+        self._log_scheduled = False
+        # Один рабочий поток: VirtualFDWManager хранит общие подключения и не рассчитан на параллельные запросы
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # Общий пул на все время работы окна; потоки создаются по мере надобности
+        self._pool = ThreadPoolExecutor(max_workers=POOL_WORKERS)
+        self.tk.eval(INSERT_ROWS_TCL)
+        self.tk.eval(INSERT_ITEMS_TCL)
+        self.tk.eval(COLUMN_VALUES_TCL)
+        self.tk.eval(SELECTION_TEXT_TCL)
         
         # Сначала создаём все виджеты
         self.main_frame = ttk.Frame(self)
         self.main_frame.pack(fill=tk.BOTH, expand=True)
         self._create_widgets()  # Теперь result_notebook точно будет создан
         
+        # Одна всплывающая подсказка на все кнопки панели
+        self._tooltip = tk.Toplevel(self)
+        self._tooltip.withdraw()
+        self._tooltip.overrideredirect(True)
+        self._tooltip_label = tk.Label(self._tooltip, bg="#ffffe0", relief=tk.SOLID, borderwidth=1)
+        self._tooltip_label.pack()
+        self._tooltip_text = None
+        
         # Затем настраиваем меню и горячие клавиши
         self._create_menu()
         self._create_toolbar()
         self._bind_hotkeys()
+        self.bind("<Map>", self._on_map, add="+")
+        # Одна привязка на класс вместо отдельного обработчика у каждого Treeview результатов
+        self.bind_class("Treeview", "<Motion>", self._on_tree_motion, add="+")
         
         # Остальные атрибуты
         self.explain_window = None
+        self._explain_feed = None  # Отложенный вывод следующей порции плана
         self.connections_window = None
         self.mapping_window = None
+        # Учетные данные проверяются перед первым запросом, а не при запуске
+        self._auth_checked = False
+
+    def _ensure_auth(self):
+        """Один раз, перед первым запросом, проверяет учетные данные и открывает подключения"""
+        if not self._auth_checked:
+            self._auth_checked = True
+            self._check_auth()
 
     def _check_auth(self):
         """Проверка необходимости аутентификации"""
-        for conn_name in self.fdw.connection_params:
-            user, password = AuthManager.get_credentials(conn_name)
+        credentials = AuthManager.get_credentials_many(list(self.fdw.connection_params), executor=self._pool)
+        to_warm = []
+        for conn_name, (user, password) in credentials.items():
             if not user or not password:
                 self._show_auth_window(conn_name)
                 break
-            else:
-                # Предварительная инициализация подключения
-                try:
-                    self.fdw.get_connection(conn_name)
-                except Exception as e:
-                    self.log(f"Ошибка предварительного подключения: {str(e)}")
+            to_warm.append(conn_name)
+        
+        # Подключения открываются в рабочем потоке до запроса, который стоит за ними в очереди
+        if to_warm:
+            self._run_in_background(self._preconnect, to_warm, callback=self._on_preconnect_done)
+
+    def _preconnect(self, conn_names):
+        """Открывает подключения параллельно (в рабочем потоке)"""
+        # Запросы ждут в очереди рабочего потока, пока не откроются все подключения,
+        # поэтому словарь connections в это время меняют только потоки пула
+        futures = {name: self._pool.submit(self.fdw.get_connection, name) for name in conn_names}
+        errors = []
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(f"{name}: {str(e)}")
+        return errors
+
+    def _on_preconnect_done(self, future):
+        """Сообщает об ошибках предварительного подключения"""
+        try:
+            errors = future.result()
+        except Exception as e:
+            errors = [str(e)]
+        for error in errors:
+            self.log(f"Ошибка предварительного подключения: {error}")
 
     def _show_auth_window(self, connection_name):
         def auth_callback(user, password):
+            # Явная передача учетных данных; подключение открывается в рабочем потоке запросов
+            self._run_in_background(
+                self.fdw.get_connection, connection_name, user, password,
+                callback=lambda future: on_connected(future, user, password)
+            )
+        
+        def on_connected(future, user, password):
             try:
-                # Явная передача учетных данных
-                conn = self.fdw.get_connection(connection_name, user, password)
+                future.result()
                 self.fdw.saved_credentials[connection_name] = {
                     'user': user,
                     'password': password
@@ -86,9 +212,15 @@ class FDWGUI(tk.Tk):
         self.editor = SQLText(editor_frame, height=15)
         self.editor.pack(fill=tk.BOTH, expand=True)
 
+        # Фиксированная высота строк результатов: Treeview не пересчитывает ее при вставке.
+        # Отдельный стиль, чтобы не менять остальные Treeview приложения
+        ttk.Style(self).configure('Results.Treeview', rowheight=20)
+
         # Notebook для результатов
         self.result_notebook = ttk.Notebook(self.main_frame)
         self.result_notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        # Вкладки заполняются при первом открытии
+        self.result_notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
         
         # Консоль
         console_frame = ttk.LabelFrame(self.main_frame, text="Execution Console")
@@ -96,7 +228,7 @@ class FDWGUI(tk.Tk):
         self.console = scrolledtext.ScrolledText(console_frame, height=8, wrap=tk.WORD)
         self.console.pack(fill=tk.BOTH, expand=True)
 
-    def _create_result_tab(self, query_text=None):
+    def _create_result_tab(self, query_text=None, select=True):
         """Создает новую вкладку для отображения результатов"""
         if self.result_notebook is None:
             raise RuntimeError("Notebook не инициализирован. Сначала вызовите _create_widgets()")
@@ -120,7 +252,8 @@ class FDWGUI(tk.Tk):
             tree_frame,
             yscrollcommand=y_scroll.set,
             xscrollcommand=x_scroll.set,
-            selectmode='extended'  # Разрешаем множественное выделение
+            selectmode='extended',  # Разрешаем множественное выделение
+            style='Results.Treeview'
         )
         tree.pack(fill=tk.BOTH, expand=True)
         
@@ -137,61 +270,114 @@ class FDWGUI(tk.Tk):
             tab_name = query_text[:20] + "..." if len(query_text) > 20 else query_text
         
         self.result_notebook.add(tab_frame, text=tab_name)
-        self.result_notebook.select(tab_frame)
+        if select:
+            self.result_notebook.select(tab_frame)
         
         # Сохраняем ссылку на текущее дерево
         self.current_tree = tree  # Обновляем current_tree
         
         return tree
     
-    def _display_results_in_tab(self, df, query_text=None):
+    def _display_results_in_tab(self, df, query_text=None, select=True):
         """Отображает результаты в новой вкладке"""
-        tree = self._create_result_tab(query_text)
+        tree = self._create_result_tab(query_text, select)
         
-        try:
-            # Очищаем предыдущие данные
-            tree.delete(*tree.get_children())
-            
-            if df.empty:
-                self.log("Нет данных для отображения", error=True)
-                return
+        if df.empty:
+            self.log("Нет данных для отображения", error=True)
+            return
+
+        # Сохраняем результат; Treeview заполняется, когда вкладку открывают
+        tab_id = self.result_notebook.tabs()[-1]
+        self.query_results[tab_id] = {
+            'tree': tree,
+            'data': df,
+            'query': query_text,
+            'rendered': False
+        }
+        # Первая вкладка в пустом Notebook выбирается автоматически и тоже заполняется сразу
+        if select or self.result_notebook.select() == tab_id:
+            self._render_tab(tab_id)
 
-            # Настраиваем колонки
-            tree["columns"] = list(df.columns)
-            for col in df.columns:
-                tree.heading(col, text=col, anchor=tk.W)
-                tree.column(col, width=120, stretch=False, anchor=tk.W)
+    def _on_tab_changed(self, event):
+        """Заполняет открытую вкладку, если она еще не отображалась"""
+        tab_id = self.result_notebook.select()
+        if tab_id:
+            self._render_tab(tab_id)
+
+    def _render_tab(self, tab_id):
+        """Настраивает колонки и выводит строки результата во вкладке"""
+        result = self.query_results.get(tab_id)
+        if result is None or result['rendered']:
+            return
+        result['rendered'] = True
+        tree, df = result['tree'], result['data']
+        
+        try:
+            # Настраиваем колонки; у вкладки, очищенной _evict_tabs, они уже настроены
+            columns = tuple(df.columns)
+            if tuple(tree['columns']) != columns:
+                tree.configure(columns=columns)
+                heading, column, W = tree.heading, tree.column, tk.W
+                for col, width in zip(columns, self._column_widths(df)):
+                    heading(col, text=col, anchor=W)
+                    column(col, width=width, stretch=False, anchor=W)
             
-            # Вставляем данные
-            for _, row in df.iterrows():
-                tree.insert("", tk.END, values=list(row))
-                
-            # Сохраняем результат
-            tab_id = self.result_notebook.tabs()[-1]
-            self.query_results[tab_id] = {
-                'tree': tree,
-                'data': df,
-                'query': query_text
-            }
+            # Вставляем данные: первая страница сразу, остальные - по мере прокрутки.
+            # Полный результат остается в query_results и используется при копировании столбца
+            self._show_rows_lazily(tree, df)
 
         except Exception as e:
             self.log(f"Ошибка отображения: {str(e)}", error=True)
+        
+        self._live_tabs.append(tab_id)
+        self._evict_tabs()
+
+    def _evict_tabs(self):
+        """Очищает самые старые заполненные вкладки сверх MAX_LIVE_TABS"""
+        current = self.result_notebook.select()
+        for _ in range(len(self._live_tabs) - MAX_LIVE_TABS):
+            tab_id = self._live_tabs.popleft()
+            if tab_id == current:
+                self._live_tabs.append(tab_id)
+                continue
+            result = self.query_results.get(tab_id)
+            if result is None:
+                continue
+            # DataFrame остается в query_results, строки выводятся снова при открытии вкладки
+            tree = result['tree']
+            tree.delete(*tree.get_children())
+            result['rendered'] = False
+            # Загрузчик страниц держит результат и позицию догрузки; при открытии создается заново
+            self._row_loaders.pop(tree, None)
+
+    @staticmethod
+    def _column_widths(df):
+        """Ширина колонок в пикселях по длине заголовка и значений первых строк"""
+        # Длины считаются по столбцу векторно, без измерения шрифтом каждой ячейки;
+        # общий массив строк фиксированной ширины раздувал бы каждую ячейку до самой длинной
+        sample = df.iloc[:COLUMN_SAMPLE_ROWS]
+        widths = []
+        for i, col in enumerate(df.columns):
+            # Длина текста, который показывает Treeview: ячейки выводятся через str()
+            cells = sample.iloc[:, i].astype(str).str.len().clip(upper=COLUMN_MAX_CHARS)
+            chars = min(max(len(str(col)), int(cells.max()) if len(cells) else 0), COLUMN_MAX_CHARS)
+            widths.append(chars * COLUMN_CHAR_PX + COLUMN_PAD_PX)
+        return widths
 
     def _create_tooltip(self, widget, text):
-        # Реализация всплывающих подсказок
-        tooltip = tk.Toplevel(widget)
-        tooltip.withdraw()
-        tooltip.overrideredirect(True)
-        
+        # Реализация всплывающих подсказок: общий Toplevel получает текст кнопки при наведении
         def enter(event):
             x = widget.winfo_rootx() + widget.winfo_width() + 5
             y = widget.winfo_rooty() + (widget.winfo_height() // 2)
-            tooltip.geometry(f"+{x}+{y}")
-            tooltip.deiconify()
-            tk.Label(tooltip, text=text, bg="#ffffe0", relief=tk.SOLID, borderwidth=1).pack()
+            # Текст меняется только при переходе на другую кнопку
+            if self._tooltip_text != text:
+                self._tooltip_label.config(text=text)
+                self._tooltip_text = text
+            self._tooltip.geometry(f"+{x}+{y}")
+            self._tooltip.deiconify()
         
         def leave(event):
-            tooltip.withdraw()
+            self._tooltip.withdraw()
         
         widget.bind("<Enter>", enter)
         widget.bind("<Leave>", leave)
@@ -267,15 +453,14 @@ class FDWGUI(tk.Tk):
         content = ""
         
         try:
-            with open(env_path, 'r') as f:
-                content = f.read()
+            content = read_env_file(env_path)
         except Exception as e:
             content = f"Ошибка чтения .env: {str(e)}"
         
         config_info = f"Путь к .env: {env_path}\n\n"
         config_info += f"Содержимое .env:\n{content}\n\n"
         config_info += f"Текущие подключения: {self.fdw.connection_params}\n"
-        config_info += f"Текущий маппинг схем: {self.fdw.schema_mapping}"
+        config_info += f"Текущий маппинг схем: {dict(self.fdw.schema_mapping)}"
         
         messagebox.showinfo("Конфигурация", config_info)
 
@@ -292,14 +477,65 @@ class FDWGUI(tk.Tk):
             self.execute()
             return
         
-        for query in queries:
-            try:
-                result, exec_time = self.fdw.execute_query(query)
-                self._display_results_in_tab(result, query)
+        self._ensure_auth()
+        if all(READ_ONLY_QUERY_RE.match(query) for query in queries):
+            # Чтения независимы: выполняются параллельно, каждое со своей копией менеджера
+            # и своими подключениями (execute_query закрывает все подключения менеджера по завершении)
+            pending = deque(
+                (self._pool.submit(self.fdw.clone().execute_query, query), query)
+                for query in queries
+            )
+            self._poll_multiple(pending)
+        else:
+            # Изменения данных и транзакции - по порядку и на одних подключениях
+            self._run_in_background(self._execute_in_order, queries, callback=self._on_ordered_queries_done)
+
+    def _execute_in_order(self, queries):
+        """Выполняет запросы по очереди в одной сессии менеджера (в рабочем потоке)"""
+        outcomes = []
+        with self.fdw.session():
+            for query in queries:
+                try:
+                    outcomes.append((query, self.fdw.execute_query(query), None))
+                except Exception as e:
+                    outcomes.append((query, None, e))
+        return outcomes
+
+    def _on_ordered_queries_done(self, future):
+        """Показывает результаты последовательно выполненных запросов"""
+        try:
+            outcomes = future.result()
+        except Exception as e:
+            self.log(f"Ошибка выполнения запросов: {str(e)}", error=True)
+            return
+        for i, (query, outcome, error) in enumerate(outcomes):
+            select = i == len(outcomes) - 1
+            if error is None:
+                result, exec_time = outcome
+                self._display_results_in_tab(result, query, select)
                 self.log(f"Запрос выполнен за {exec_time:.2f} сек. Найдено строк: {len(result)}")
-            except Exception as e:
-                self.log(f"Ошибка выполнения запроса '{query[:20]}...': {str(e)}", error=True)
-                self._display_results_in_tab(pd.DataFrame({'Error': [str(e)]}), query)
+            else:
+                self.log(f"Ошибка выполнения запроса '{query[:20]}...': {str(error)}", error=True)
+                self._display_results_in_tab(pd.DataFrame({'Error': [str(error)]}), query, select)
+
+    def _poll_multiple(self, pending):
+        """Показывает готовые результаты в порядке запросов"""
+        while pending and pending[0][0].done():
+            future, query = pending.popleft()
+            # Открывается вкладка последнего запроса; остальные заполнятся при переходе на них
+            self._on_multiple_query_done(future, query, select=not pending)
+        if pending:
+            self.after(FUTURE_POLL_MS, self._poll_multiple, pending)
+
+    def _on_multiple_query_done(self, future, query, select=True):
+        """Показывает результат одного из нескольких запросов"""
+        try:
+            result, exec_time = future.result()
+            self._display_results_in_tab(result, query, select)
+            self.log(f"Запрос выполнен за {exec_time:.2f} сек. Найдено строк: {len(result)}")
+        except Exception as e:
+            self.log(f"Ошибка выполнения запроса '{query[:20]}...': {str(e)}", error=True)
+            self._display_results_in_tab(pd.DataFrame({'Error': [str(e)]}), query, select)
 
     def map_results(self):
         """Маппинг результатов из разных вкладок"""
@@ -357,17 +593,32 @@ class FDWGUI(tk.Tk):
         def perform_join():
             """Выполняет соединение"""
             try:
-                df1 = self.query_results[first_combo.get()]['data']
-                df2 = self.query_results[second_combo.get()]['data']
+                first_key = first_key_combo.get()
+                second_key = second_key_combo.get()
                 
-                merged = pd.merge(
-                    df1, 
-                    df2, 
-                    left_on=first_key_combo.get(), 
-                    right_on=second_key_combo.get(), 
-                    how=join_type_combo.get(),
-                    suffixes=('_1', '_2')
-                )
+                if first_key == second_key:
+                    # Одинаковые ключи: соединение по индексам, которые строятся один раз на вкладку
+                    first_df = self.query_results[first_combo.get()]['data']
+                    second_df = self.query_results[second_combo.get()]['data']
+                    # Порядок колонок как у pd.merge: reset_index ставит ключ первым
+                    merged_order = pd.merge(
+                        first_df.head(0), second_df.head(0), on=first_key, suffixes=('_1', '_2')
+                    ).columns
+                    merged = self._indexed_result(first_combo.get(), first_key).join(
+                        self._indexed_result(second_combo.get(), second_key),
+                        how=join_type_combo.get(),
+                        lsuffix='_1',
+                        rsuffix='_2'
+                    ).reset_index().reindex(columns=merged_order)
+                else:
+                    merged = pd.merge(
+                        self.query_results[first_combo.get()]['data'], 
+                        self.query_results[second_combo.get()]['data'], 
+                        left_on=first_key, 
+                        right_on=second_key, 
+                        how=join_type_combo.get(),
+                        suffixes=('_1', '_2')
+                    )
                 
                 self._display_results_in_tab(
                     merged, 
@@ -408,6 +659,14 @@ class FDWGUI(tk.Tk):
         second_combo.bind('<<ComboboxSelected>>', update_columns)
         
 
+    def _indexed_result(self, tab_id, key):
+        """Результат вкладки с индексом по key; индекс кешируется в query_results"""
+        result = self.query_results[tab_id]
+        indexed = result.setdefault('indexed', {})
+        if key not in indexed:
+            indexed[key] = result['data'].set_index(key)
+        return indexed[key]
+
     def explain(self):
         """Вывод плана выполнения запроса в отдельное окно"""
         query = self.editor.get("1.0", tk.END).strip()
@@ -415,25 +674,67 @@ class FDWGUI(tk.Tk):
             self.log("Нет запроса для объяснения", error=True)
             return
         
+        explain_query = f"EXPLAIN ANALYZE {query}"
+        self._ensure_auth()
+        self._run_in_background(self.fdw.execute_query, explain_query, callback=self._on_explain_done)
+
+    def _on_explain_done(self, future):
+        """Выводит план выполнения после завершения запроса в рабочем потоке"""
         try:
-            explain_query = f"EXPLAIN ANALYZE {query}"
-            result, exec_time = self.fdw.execute_query(explain_query)
+            result, exec_time = future.result()
             
             if self.explain_window is None or not self.explain_window.winfo_exists():
                 self.explain_window = tk.Toplevel(self)
                 self.explain_window.title("План выполнения")
+                self.explain_window.protocol("WM_DELETE_WINDOW", self.explain_window.withdraw)
                 self.explain_text = scrolledtext.ScrolledText(self.explain_window, wrap=tk.WORD)
                 self.explain_text.pack(fill=tk.BOTH, expand=True)
+            else:
+                self.explain_window.deiconify()
             
             self.explain_text.delete('1.0', tk.END)
             if not result.empty:
-                plan_text = "\n".join(result.iloc[:, 0].astype(str))
-                self.explain_text.insert(tk.END, plan_text)
+                lines = result.iloc[:, 0].to_numpy(dtype=object)
+                # Строки плана обычно уже str: преобразуем, только если встретилось что-то другое
+                if not all(type(line) is str for line in lines):
+                    lines = lines.astype(str)
+                self._feed_explain(lines)
             self.log(f"План выполнен за {exec_time:.2f} сек.")
             
         except Exception as e:
             self.log(f"Ошибка плана: {str(e)}", error=True)
 
+    def _feed_explain(self, lines, start=0):
+        """Выводит план порциями, возвращая управление циклу Tk между ними"""
+        if start == 0 and self._explain_feed is not None:
+            self.after_cancel(self._explain_feed)
+        self._explain_feed = None
+        if not self.explain_text.winfo_exists():
+            return
+        end = start + EXPLAIN_CHUNK_LINES
+        chunk = "\n".join(lines[start:end])
+        self.explain_text.insert(tk.END, chunk if end >= len(lines) else chunk + "\n")
+        if end < len(lines):
+            self._explain_feed = self.after_idle(self._feed_explain, lines, end)
+
+    def _run_in_background(self, func, *args, callback):
+        """Выполняет func в рабочем потоке и передает Future в callback в потоке Tk"""
+        future = self._executor.submit(func, *args)
+        self._poll_future(future, callback)
+        return future
+
+    def _poll_future(self, future, callback):
+        """Ждет завершения Future, не блокируя цикл событий Tk"""
+        if future.done():
+            callback(future)
+        else:
+            self.after(FUTURE_POLL_MS, self._poll_future, future, callback)
+
+    def destroy(self):
+        """Останавливает рабочий поток вместе с окном"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        super().destroy()
 
 
     #def export_csv(self):
@@ -466,35 +767,77 @@ class FDWGUI(tk.Tk):
             messagebox.showinfo("Информация", "Нет данных для экспорта")
             return
         
-        try:
-            # Создаем копию данных для преобразования
-            export_data = self.current_data.copy()
-            
-            # Преобразуем столбцы с datetime, содержащие timezone
-            for col in export_data.columns:
-                if pd.api.types.is_datetime64_any_dtype(export_data[col]):
-                    # Удаляем информацию о часовом поясе
-                    export_data[col] = export_data[col].dt.tz_localize(None)
-            
-            # Сохраняем файл в текущей директории
-            file_path = os.path.abspath(filename)
+        file_path = os.path.abspath(filename)
+        self._run_in_background(self._write_excel, self.current_data, file_path,
+                                callback=lambda future: self._on_export_done(future, file_path))
+
+    @staticmethod
+    def _write_excel(data, file_path):
+        """Записывает DataFrame в Excel (выполняется в рабочем потоке)"""
+        # Excel не хранит часовой пояс: удаляем его у всех datetime-столбцов с timezone.
+        # Столбцы заменяются по позиции в неглубокой копии; при Copy-on-Write остальные данные не копируются
+        tz_idx = [i for i, dtype in enumerate(data.dtypes) if getattr(dtype, 'tz', None) is not None]
+        export_data = data
+        if tz_idx:
+            export_data = data.copy(deep=False)
+            for i in tz_idx:
+                export_data.isetitem(i, data.iloc[:, i].dt.tz_localize(None))
+        
+        if xlsxwriter is None:
             export_data.to_excel(file_path, index=False)
-            
+        else:
+            FDWGUI._write_xlsx_rows(export_data, file_path)
+
+    @staticmethod
+    def _write_xlsx_rows(data, file_path):
+        """Пишет DataFrame в xlsx построчно: в памяти только текущая порция строк"""
+        # constant_memory сбрасывает каждую строку на диск, поэтому строки пишутся строго по порядку
+        workbook = xlsxwriter.Workbook(file_path, {
+            'constant_memory': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        try:
+            sheet = workbook.add_worksheet('Sheet1')
+            sheet.write_row(0, 0, [str(col) for col in data.columns])
+            row_num = 1
+            for start in range(0, len(data), EXPORT_CHUNK_ROWS):
+                chunk = data.iloc[start:start + EXPORT_CHUNK_ROWS]
+                values = chunk.to_numpy(dtype=object, copy=True)
+                values[chunk.isna().to_numpy()] = None  # NaN/NaT - пустые ячейки, как в to_excel
+                for row in values.tolist():
+                    for col_num, value in enumerate(row):
+                        try:
+                            sheet.write(row_num, col_num, value)
+                        except TypeError:
+                            # Типы, которых xlsxwriter не знает (UUID, dict), пишем строкой, как pandas
+                            sheet.write_string(row_num, col_num, str(value))
+                    row_num += 1
+        finally:
+            workbook.close()
+
+    def _on_export_done(self, future, file_path):
+        """Сообщает о результате экспорта"""
+        try:
+            future.result()
             self.log(f"Данные экспортированы в Excel: {file_path}")
             messagebox.showinfo("Успех", f"Данные успешно экспортированы в файл:\n{file_path}")
-                
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка при экспорте данных:\n{str(e)}")
             self.log(f"Ошибка экспорта: {str(e)}", error=True)
 
     def show_connections(self):
         """Окно управления подключениями"""
+        # Окно создается один раз: при закрытии оно скрывается, а при повторном открытии обновляется
         if self.connections_window and self.connections_window.winfo_exists():
-            self.connections_window.destroy()
+            self.connections_window.deiconify()
+            self.connections_window.lift()
+            self.update_connections()
+            return
             
         self.connections_window = tk.Toplevel(self)
         self.connections_window.title("Управление подключениями")
         self.connections_window.geometry("500x300")
+        self.connections_window.protocol("WM_DELETE_WINDOW", self.connections_window.withdraw)
         
         frame = ttk.Frame(self.connections_window)
         frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -529,11 +872,22 @@ class FDWGUI(tk.Tk):
     def show_schema_mapping(self):
         """Окно управления маппингом схем"""
         if self.mapping_window and self.mapping_window.winfo_exists():
-            self.mapping_window.destroy()
+            self.mapping_window.deiconify()
+            self.mapping_window.lift()
+            self.mapping_window._load_mappings()
+            self.mapping_window.grab_set()
+            return
             
         self.mapping_window = SchemaMappingWindow(self, self.fdw)
+        self.mapping_window.protocol("WM_DELETE_WINDOW", self._hide_schema_mapping)
         self.mapping_window.grab_set()
 
+    def _hide_schema_mapping(self):
+        """Скрывает окно маппинга схем, освобождая захват ввода"""
+        # Захват скрытого окна заблокировал бы ввод в главное окно
+        self.mapping_window.grab_release()
+        self.mapping_window.withdraw()
+
     def add_connection(self):
         """Добавление нового подключения"""
         EditConnectionWindow(self, self.fdw, mode='add')
@@ -553,14 +907,8 @@ class FDWGUI(tk.Tk):
             return
         conn_name = self.conn_tree.item(selected[0], "values")[0]
         if messagebox.askyesno("Подтверждение", f"Удалить подключение {conn_name}?"):
-            # Удаляем связанные маппинги
-            schemas_to_delete = []
-            for schema, conn in self.fdw.schema_mapping.items():
-                if conn == conn_name:
-                    schemas_to_delete.append(schema)
-            
-            for schema in schemas_to_delete:
-                del self.fdw.schema_mapping[schema]
+            # Удаляем связанные маппинги по обратному индексу, без просмотра всего маппинга
+            self.fdw.remove_schema_mappings(conn_name)
             
             # Удаляем подключение (только если это словарь)
             if isinstance(self.fdw.connection_params, dict) and conn_name in self.fdw.connection_params:
@@ -578,24 +926,43 @@ class FDWGUI(tk.Tk):
         if not isinstance(self.fdw.connection_params, dict):
             self.fdw.connection_params = {}
         
+        # Статусы снимаются в рабочем потоке запросов; до ответа в строках стоит заглушка
+        rows = {}
         for name, params in self.fdw.connection_params.items():
-            # Добавляем проверку существования соединения
-            status = "Активно" 
-            if name in self.fdw.connections:
-                try:
-                    # Проверяем статус соединения
-                    if self.fdw.connections[name].closed:
-                        status = "Неактивно"
-                except:
-                    status = "Неактивно"
-            else:
-                status = "Неактивно"
-                
-            self.conn_tree.insert("", "end", values=(
+            rows[name] = self.conn_tree.insert("", "end", values=(
                 name,
                 params.get("host", "N/A"),
-                status
+                "..."
             ))
+        self._run_in_background(self._connection_statuses, list(rows),
+                                callback=lambda future: self._on_statuses_done(future, rows))
+
+    def _connection_statuses(self, names):
+        """Статусы открытых подключений менеджера (выполняется в рабочем потоке)"""
+        statuses = {}
+        for name in names:
+            connection = self.fdw.connections.get(name)
+            try:
+                # Проверяем статус соединения
+                active = connection is not None and not connection.closed
+            except Exception:
+                active = False
+            statuses[name] = "Активно" if active else "Неактивно"
+        return statuses
+
+    def _on_statuses_done(self, future, rows):
+        """Записывает статусы подключений в строки списка"""
+        if not self.conn_tree.winfo_exists():
+            return
+        try:
+            statuses = future.result()
+        except Exception:
+            statuses = {}
+        for name, iid in rows.items():
+            if not self.conn_tree.exists(iid):
+                continue
+            _, host, _ = self.conn_tree.item(iid, "values")
+            self.conn_tree.item(iid, values=(name, host, statuses.get(name, "Неактивно")))
 
     def reconnect_connection(self):
         """Переподключение выбранного соединения"""
@@ -604,15 +971,23 @@ class FDWGUI(tk.Tk):
             return
             
         conn_name = self.conn_tree.item(selected[0], "values")[0]
+        self._run_in_background(self._reconnect, conn_name,
+                                callback=lambda future: self._on_reconnect_done(future, conn_name))
+
+    def _reconnect(self, conn_name):
+        """Закрывает и заново открывает подключение (в рабочем потоке)"""
+        self._close_connection(conn_name)
+        self.fdw.get_connection(conn_name)
+
+    def _on_reconnect_done(self, future, conn_name):
+        """Сообщает о результате переподключения"""
         try:
-            if conn_name in self.fdw.connections:
-                self.fdw.connections[conn_name].close()
-                del self.fdw.connections[conn_name]
-            self.fdw.get_connection(conn_name)
-            self.update_connections()
-            messagebox.showinfo("Успех", f"Подключение {conn_name} восстановлено")
+            future.result()
         except Exception as e:
             messagebox.showerror("Ошибка", str(e))
+            return
+        self.update_connections()
+        messagebox.showinfo("Успех", f"Подключение {conn_name} восстановлено")
 
     def close_connection(self):
         """Закрытие выбранного соединения"""
@@ -621,9 +996,26 @@ class FDWGUI(tk.Tk):
             return
             
         conn_name = self.conn_tree.item(selected[0], "values")[0]
-        if conn_name in self.fdw.connections:
-            self.fdw.connections[conn_name].close()
-            del self.fdw.connections[conn_name]
+        self._run_in_background(self._close_connection, conn_name,
+                                callback=lambda future: self._on_close_done(future, conn_name))
+
+    def _close_connection(self, conn_name):
+        """Закрывает подключение и убирает его из менеджера (в рабочем потоке)"""
+        # Словарь connections меняется только в потоке, где выполняются запросы
+        conn = self.fdw.connections.pop(conn_name, None)
+        if conn is None:
+            return False
+        conn.close()
+        return True
+
+    def _on_close_done(self, future, conn_name):
+        """Сообщает о закрытии подключения"""
+        try:
+            closed = future.result()
+        except Exception as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        if closed:
             self.update_connections()
             messagebox.showinfo("Успех", f"Подключение {conn_name} закрыто")
 
@@ -634,8 +1026,16 @@ class FDWGUI(tk.Tk):
             self.log("Нет запроса для выполнения", error=True)
             return
         
+        self._ensure_auth()
+        self._run_in_background(
+            self.fdw.execute_query, query,
+            callback=lambda future: self._on_query_done(future, query)
+        )
+
+    def _on_query_done(self, future, query):
+        """Показывает результат запроса, выполненного в рабочем потоке"""
         try:
-            result, exec_time = self.fdw.execute_query(query)
+            result, exec_time = future.result()
             self.current_data = result
             self._display_results_in_tab(result, query)
             self.log(f"Запрос выполнен за {exec_time:.2f} сек. Найдено строк: {len(result)}")
@@ -643,58 +1043,86 @@ class FDWGUI(tk.Tk):
             self.log(f"Ошибка: {str(e)}", error=True)
             self.current_data = None
 
-    def _display_results(self, df):
-        try:
-        # Полная очистка Treeview перед новым выводом
-            self.tree.delete(*self.tree.get_children())
-            self.tree["columns"] = []  # Сбрасываем колонки
-            
-            if df.empty:
-                self.log("Нет данных для отображения", error=True)
-                return
-
-            # Обновление колонок с правильной инициализацией
-            valid_columns = df.columns.tolist()
-            
-            # 1. Удаление старых колонок
-            for col in self.tree["columns"]:
-                self.tree.heading(col, text="")
-                self.tree.column(col, width=0)
+    def _show_rows_lazily(self, tree, df):
+        """Вставляет первую страницу строк и догружает следующие при прокрутке"""
+        if tree not in self._scroll_hooked:
+            # Перехватываем yscrollcommand: он вызывается при любой прокрутке
+            scroll_command = tree.cget('yscrollcommand')
             
-            # 2. Создание новых колонок
-            self.tree["columns"] = valid_columns
-            for col in valid_columns:
-                self.tree.heading(
-                    col, 
-                    text=col,
-                    anchor="w"
-                )
-                self.tree.column(
-                    col, 
-                    width=120, 
-                    stretch=False, 
-                    anchor="w"
-                )
+            def on_yview(first, last):
+                if scroll_command:
+                    tree.tk.call(*tree.tk.splitlist(scroll_command), first, last)
+                # У очищенной вкладки загрузчика нет до следующего открытия
+                loader = self._row_loaders.get(tree)
+                if loader is not None and float(last) > 0.9:
+                    loader()
             
-            # 3. Вставка данных
-            for _, row in df.iterrows():
-                self.tree.insert(
-                    "", 
-                    tk.END, 
-                    values=[row[col] for col in valid_columns]
-                )
+            tree.configure(yscrollcommand=on_yview)
+            self._scroll_hooked.add(tree)
+        
+        loaded = 0
+        total = len(df)
+        
+        def load_page():
+            nonlocal loaded
+            if loaded >= total:
+                return
+            # В объекты Python переводится только выводимая страница, а не весь результат
+            rows = df.iloc[loaded:loaded + RESULT_PAGE_SIZE].to_numpy(dtype=object).tolist()
+            if loaded == 0:
+                self._insert_rows(tree, rows)
+            else:
+                # Во время прокрутки не скрываем виджет, чтобы он не мигал
+                insert_rows(tree, rows)
+            loaded = min(loaded + RESULT_PAGE_SIZE, total)
+        
+        self._row_loaders[tree] = load_page
+        load_page()
 
-        except Exception as e:
-            self.log(f"Ошибка отображения: {str(e)}", error=True)
+    def _insert_rows(self, tree, rows):
+        """Вставляет строки в Treeview одной пачкой, пока виджет скрыт"""
+        # Скрытый виджет не пересчитывает геометрию и прокрутку на каждую вставку
+        pack_info = tree.pack_info() if tree.winfo_manager() == 'pack' else None
+        if pack_info:
+            tree.pack_forget()
+        try:
+            insert_rows(tree, rows)
+        finally:
+            if pack_info:
+                tree.pack(pack_info)
 
     def log(self, message, error=False):
+        """Добавляет сообщение в буфер лога; вывод в консоль - при простое Tk"""
+        tag = "ERROR" if error else "INFO"
+        self._log_buf.append(f"[{tag}] {message}\n")
+        if not self._log_scheduled:
+            self._log_scheduled = True
+            self.after_idle(self._flush_log)
+
+    def _on_map(self, event):
+        """Выводит лог, накопленный пока окно было свернуто"""
+        if event.widget is self and self._log_buf and not self._log_scheduled:
+            self._log_scheduled = True
+            self.after_idle(self._flush_log)
+
+    def _flush_log(self):
+        """Выводит накопленные сообщения одной вставкой и прокручивает консоль"""
+        self._log_scheduled = False
+        # Свернутое окно не перерисовываем: сообщения копятся до его разворачивания
+        if self.state() == 'iconic':
+            return
+        text = "".join(self._log_buf)
+        self._log_buf.clear()
         # Проверяем существование консоли перед использованием
         if not hasattr(self, 'console') or self.console.winfo_exists() == 0:
             return
             
-        tag = "ERROR" if error else "INFO"
         try:
-            self.console.insert(tk.END, f"[{tag}] {message}\n")
+            self.console.insert(tk.END, text)
+            # Обрезаем начало, чтобы консоль не росла без ограничений
+            lines = int(self.console.index('end-1c').split('.')[0])
+            if lines > LOG_MAX_LINES:
+                self.console.delete('1.0', f'{lines - LOG_MAX_LINES}.0')
             self.console.see(tk.END)
         except Exception as e:
             print(f"Ошибка логирования: {str(e)}")  # Резервное логирование
@@ -708,7 +1136,7 @@ class FDWGUI(tk.Tk):
         if tree is None:
             return
         
-        # Создаём контекстное меню
+        # Создаём контекстное меню; команды пунктов хранит Tk и удаляет вместе с меню и Treeview
         context_menu = tk.Menu(tree, tearoff=0)
         context_menu.add_command(label="Copy", command=lambda: self._copy_selected_data(tree))
         context_menu.add_command(label="Copy with Headers", command=lambda: self._copy_selected_data(tree, with_headers=True))
@@ -724,125 +1152,187 @@ class FDWGUI(tk.Tk):
         column_menu = tk.Menu(context_menu, tearoff=0)
         context_menu.add_cascade(label="Copy Column", menu=column_menu)
         
-        # Переменные для хранения текущего столбца и значения
-        self._current_hover_column = None
-        self._current_hover_value = None
+        self._tree_state[tree] = {
+            'menu': str(context_menu),
+            'column_menu': str(column_menu),
+            'columns': None,      # Столбцы, по которым подменю построено в последний раз
+            'col_index': {},      # Индексы столбцов для _copy_column_data
+            'hover_cell': None,   # (строка, столбец), для которых значение уже получено
+            'hover_value': None,  # Значение ячейки под курсором
+            'posting': False,     # Меню в процессе показа
+        }
         
-        def update_column_menu():
-            """Обновляет подменю с доступными столбцами"""
-            column_menu.delete(0, tk.END)
-            columns = tree["columns"]
+        # Привязка событий
+        tree.bind("<Button-3>", self._show_tree_context_menu)
+        tree.bind("<Control-c>", self._on_tree_copy)
+
+    def _update_column_menu(self, tree, state):
+        """Обновляет подменю с доступными столбцами"""
+        columns = tuple(tree["columns"])
+        if columns == state['columns']:
+            return
+        state['columns'] = columns
+        # Индексы столбцов для _copy_column_data, чтобы не искать их при каждом копировании
+        state['col_index'] = {col: i for i, col in enumerate(columns)}
+        column_menu = self.nametowidget(state['column_menu'])
+        column_menu.delete(0, tk.END)
+        
+        if not columns:
+            column_menu.add_command(label="No columns", state=tk.DISABLED)
+            return
             
-            if not columns:
-                column_menu.add_command(label="No columns", state=tk.DISABLED)
-                return
-                
-            for col in columns:
-                # Получаем текст заголовка
-                heading_text = tree.heading(col)['text']
-                column_menu.add_command(
-                    label=f"{heading_text}",
-                    command=lambda c=col: self._copy_column_data(tree, c)
-                )
+        for col in columns:
+            # Получаем текст заголовка
+            heading_text = tree.heading(col)['text']
+            column_menu.add_command(
+                label=f"{heading_text}",
+                command=partial(self._copy_column_data, tree, col)
+            )
 
-        def _copy_hovered_value():
-            """Копирует значение под курсором"""
-            if self._current_hover_value:
-                self.clipboard_clear()
-                self.clipboard_append(self._current_hover_value)
-                self.log(f"Скопировано: {self._current_hover_value[:20]}...")
-        
-        def on_hover(event):
-            """Обработчик наведения на ячейку"""
-            region = tree.identify("region", event.x, event.y)
-            if region == "cell":
-                column = tree.identify_column(event.x)
-                row = tree.identify_row(event.y)
-                
-                # Получаем индекс столбца
-                col_index = int(column[1:]) - 1
-                columns = tree["columns"]
-                
-                if col_index < len(columns):
-                    # Получаем значение ячейки
-                    item = tree.item(row)
-                    if col_index < len(item['values']):
-                        self._current_hover_column = columns[col_index]
-                        self._current_hover_value = str(item['values'][col_index])
-                        
-                        # Обновляем пункт меню для копирования текущего значения
-                        context_menu.entryconfig(2,  # Index of "Copy Hovered Value"
-                            label=f"Copy '{self._current_hover_value[:20]}...'",
-                            command=_copy_hovered_value,
-                            state=tk.NORMAL)
-                    else:
-                        context_menu.entryconfig(2, state=tk.DISABLED)
-                else:
-                    context_menu.entryconfig(2, state=tk.DISABLED)
-            else:
-                context_menu.entryconfig(2, state=tk.DISABLED)
-        
-        def show_context_menu(event):
-            """Показывает контекстное меню с обновленными данными"""
+    def _copy_hovered_value(self, value):
+        """Копирует значение под курсором"""
+        self._cancel_column_copy()
+        self.clipboard_clear()
+        self.clipboard_append(value)
+        self.log(f"Скопировано: {value[:20]}...")
+
+    def _on_tree_copy(self, event):
+        """Ctrl+C в Treeview результатов"""
+        self._copy_selected_data(event.widget)
+
+    def _show_tree_context_menu(self, event):
+        """Показывает контекстное меню с обновленными данными"""
+        tree = event.widget
+        state = self._tree_state[tree]
+        # Повторный щелчок, пока меню еще показывается, не строит его заново
+        if state['posting']:
+            return
+        state['posting'] = True
+        try:
             # Обновляем меню столбцов
-            update_column_menu()
+            self._update_column_menu(tree, state)
             
-            # Обновляем информацию о наведении
-            on_hover(event)
+            # Ячейка под курсором определяется сразу, пункт меню настраивается один раз на показ
+            if self._hover_after_id is not None:
+                self.after_cancel(self._hover_after_id)
+            self._update_hover(tree, event.x, event.y)
+            context_menu = self.nametowidget(state['menu'])
+            value = state['hover_value']
+            if value is not None:
+                context_menu.entryconfig(2,  # Index of "Copy Hovered Value"
+                    label=f"Copy '{value[:20]}...'",
+                    command=partial(self._copy_hovered_value, value),
+                    state=tk.NORMAL)
+            else:
+                context_menu.entryconfig(2, state=tk.DISABLED)
             
             try:
                 context_menu.tk_popup(event.x_root, event.y_root)
             finally:
-                context_menu.grab_release()
+                try:
+                    context_menu.grab_release()
+                except tk.TclError:
+                    # Меню могло быть уничтожено вместе с вкладкой, пока было открыто
+                    pass
+        finally:
+            state['posting'] = False
+
+    def _on_tree_motion(self, event):
+        """Обработчик наведения: пересчет откладывается, пока мышь продолжает двигаться"""
+        tree = event.widget
+        if tree not in self._tree_state:
+            return
+        if self._hover_after_id is not None:
+            self.after_cancel(self._hover_after_id)
+        self._hover_after_id = self.after(HOVER_DELAY_MS, self._update_hover, tree, event.x, event.y)
+
+    def _update_hover(self, tree, x, y):
+        """Запоминает значение ячейки под курсором, если ячейка сменилась"""
+        self._hover_after_id = None
+        state = self._tree_state.get(tree)
+        if state is None or not tree.winfo_exists():
+            return
+        row = tree.identify_row(y)
+        if tree.identify_region(x, y) != "cell" or not row:
+            state['hover_cell'] = None
+            state['hover_value'] = None
+            return
         
-        # Привязка событий
-        tree.bind("<Button-3>", show_context_menu)
-        tree.bind("<Motion>", on_hover)  # Отслеживаем перемещение мыши
-        tree.bind("<Control-c>", lambda e: self._copy_selected_data(tree))
+        column = tree.identify_column(x)
+        if (row, column) == state['hover_cell']:
+            return
+        state['hover_cell'] = (row, column)
+        
+        # Получаем индекс столбца и значение ячейки; "#0" - служебный столбец дерева, а не данные
+        try:
+            col_index = int(column[1:]) - 1
+        except ValueError:
+            col_index = -1
+        values = tree.item(row, 'values')
+        if 0 <= col_index < len(values):
+            state['hover_value'] = str(values[col_index])
+        else:
+            state['hover_value'] = None
 
     def _copy_column_data(self, tree, column):
         """Копирует все данные из указанного столбца"""
-        # Получаем индекс столбца
-        col_index = tree["columns"].index(column)
-        
-        # Собираем все значения столбца
-        values = []
-        for item in tree.get_children():
-            item_values = tree.item(item, 'values')
-            if col_index < len(item_values):
-                values.append(str(item_values[col_index]))
-        
-        # Копируем в буфер обмена
-        if values:
+        # Получаем индекс столбца: подменю строится вместе с кэшем индексов
+        col_index = self._tree_state[tree]['col_index'][column]
+        
+        # Строки загружаются в Treeview частями, поэтому значения берем из исходного DataFrame
+        df = self._tree_data(tree)
+        if df is not None:
+            values = df.iloc[:, col_index].to_numpy(dtype=object)
+        else:
+            values = tree.tk.splitlist(tree.tk.call(COLUMN_VALUES_PROC, str(tree), column))
+        
+        # Копируем в буфер обмена порциями, не останавливая интерфейс на больших столбцах
+        if len(values):
+            self._cancel_column_copy()
             self.clipboard_clear()
-            self.clipboard_append("\n".join(values))
-            self.log(f"Скопирован столбец '{tree.heading(column)['text']}' ({len(values)} значений)")
-            
+            self._column_copy_id = self.after_idle(
+                self._copy_column_chunk, values, 0, tree.heading(column)['text'])
+
+    def _copy_column_chunk(self, values, start, heading):
+        """Добавляет в буфер обмена следующую порцию значений столбца"""
+        end = start + COPY_CHUNK_ROWS
+        text = "\n".join(map(str, values[start:end]))
+        self.clipboard_append("\n" + text if start else text)
+        if end < len(values):
+            self._column_copy_id = self.after_idle(self._copy_column_chunk, values, end, heading)
+        else:
+            self._column_copy_id = None
+            self.log(f"Скопирован столбец '{heading}' ({len(values)} значений)")
+
+    def _cancel_column_copy(self):
+        """Прерывает незавершенное копирование столбца, чтобы оно не дописало новый буфер обмена"""
+        if self._column_copy_id is not None:
+            self.after_cancel(self._column_copy_id)
+            self._column_copy_id = None
+
+    def _tree_data(self, tree):
+        """DataFrame, отображаемый во вкладке с данным Treeview"""
+        for result in self.query_results.values():
+            if result['tree'] is tree:
+                return result['data']
+        return None
 
     def _copy_selected_data(self, tree, with_headers=False):
         """Копирует выделенные данные в буфер обмена"""
-        selected_items = tree.selection()
-        if not selected_items:
+        if not tree.selection():
             return
             
-        # Получаем все колонки
-        columns = tree["columns"]
-        
-        # Подготавливаем данные для копирования
-        data = []
+        # Текст строк собирается одним вызовом Tcl, без промежуточных списков в Python
+        payload = tree.tk.call(SELECTION_TEXT_PROC, str(tree))
         
         # Добавляем заголовки, если нужно
         if with_headers:
-            data.append("\t".join(columns))
-        
-        # Добавляем данные
-        for item in selected_items:
-            values = tree.item(item, 'values')
-            data.append("\t".join(str(v) for v in values))
+            payload = "\t".join(tree["columns"]) + "\n" + payload
         
         # Копируем в буфер обмена
+        self._cancel_column_copy()
         self.clipboard_clear()
-        self.clipboard_append("\n".join(data))
+        self.clipboard_append(payload)
         self.log("Данные скопированы в буфер обмена")
 
     def _show_context_menu(self, event):
@@ -875,10 +1365,17 @@ class FDWGUI(tk.Tk):
 
     def clear_results(self):
         """Очищает все результаты"""
-        for tab_id in list(self.query_results.keys()):
+        # Вкладки уничтожаются вместе с Treeview: для больших результатов это быстрее,
+        # чем удалять строки, а forget() оставлял бы виджеты в памяти
+        for tab_id in self.result_notebook.tabs():
             self.result_notebook.forget(tab_id)
-            del self.query_results[tab_id]
+            self.nametowidget(tab_id).destroy()
+        self.query_results.clear()
+        self._live_tabs.clear()
+        self._row_loaders = {tree: loader for tree, loader in self._row_loaders.items() if tree.winfo_exists()}
+        self.current_tree = None
             
+        self._log_buf.clear()
         self.console.delete('1.0', tk.END)
         self.current_data = None
         self.log("Все результаты очищены")
@@ -1,13 +1,103 @@
 import tkinter as tk
 from tkinter import scrolledtext
 import re
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import islice
+
+# Пауза после последнего нажатия клавиши перед пересчетом подсветки, мс
+HIGHLIGHT_DELAY_MS = 75
+# Сколько строк добавлять в таблицы окон маппинга за одну догрузку при прокрутке
+MAPPING_PAGE_SIZE = 200
+# Tcl-процедура, вставляющая в Treeview список строк за один вызов из Python;
+# регистрируется главным окном при запуске
+INSERT_ROWS_PROC = 'hfpoint_insert_rows'
+INSERT_ROWS_TCL = 'proc ::%s {tree rows} {foreach row $rows {$tree insert {} end -values $row}}' % INSERT_ROWS_PROC
+# То же для строк с заданными идентификаторами: список вида {iid значения iid значения ...}
+INSERT_ITEMS_PROC = 'hfpoint_insert_items'
+INSERT_ITEMS_TCL = ('proc ::%s {tree items} {foreach {iid row} $items '
+                    '{$tree insert {} end -id $iid -values $row}}' % INSERT_ITEMS_PROC)
+
+
+def insert_rows(tree, rows):
+    """Вставляет строки одним вызовом Tcl-процедуры вместо insert на каждую строку"""
+    # Значения приводятся к str, как это делает Treeview.insert
+    tree.tk.call(INSERT_ROWS_PROC, str(tree), tuple(tuple(map(str, row)) for row in rows))
+
+
+def sync_rows(tree, rows, shown):
+    """Приводит Treeview к rows ({iid: значения}), трогая только изменившиеся строки
+
+    shown - словарь, возвращенный предыдущим вызовом (пустой при первом).
+    Новые строки добавляются в конец, поэтому порядок совпадает с порядком rows,
+    если новые ключи в rows тоже идут последними.
+    """
+    rows = {iid: tuple(map(str, values)) for iid, values in rows.items()}
+    stale = [iid for iid in shown if iid not in rows]
+    if stale:
+        tree.delete(*stale)
+    items = []
+    for iid, values in rows.items():
+        old = shown.get(iid)
+        if old is None:
+            items.append(iid)
+            items.append(values)
+        elif old != values:
+            tree.item(iid, values=values)
+    if items:
+        tree.tk.call(INSERT_ITEMS_PROC, str(tree), tuple(items))
+    return rows
+
+
+class PagedRows:
+    """Строки Treeview, которые выводятся страницами по мере прокрутки"""
+    def __init__(self, tree, page_size=MAPPING_PAGE_SIZE):
+        self.tree = tree
+        self.page_size = page_size
+        self.limit = page_size  # Сколько первых строк выведено
+        self.rows = {}
+        self.shown = {}
+        # Перехватываем yscrollcommand: он вызывается при любой прокрутке
+        self._scroll_command = tree.cget('yscrollcommand')
+        tree.configure(yscrollcommand=self._on_yview)
+
+    def set_rows(self, rows):
+        """Задает все строки ({iid: значения}); в таблице обновляется только выведенная часть"""
+        self.rows = rows
+        self._sync()
+
+    def _on_yview(self, first, last):
+        if self._scroll_command:
+            self.tree.tk.call(*self.tree.tk.splitlist(self._scroll_command), first, last)
+        if float(last) > 0.9 and self.limit < len(self.rows):
+            self.limit += self.page_size
+            self._sync()
+
+    def _sync(self):
+        self.shown = sync_rows(self.tree, dict(islice(self.rows.items(), self.limit)), self.shown)
 
 
 class SQLText(scrolledtext.ScrolledText):
     """Кастомный текстовый редактор с подсветкой SQL"""
+    # Элементы SQL одним выражением: текст просматривается за один проход,
+    # имя сработавшей группы совпадает с именем тега
+    _PATTERN = re.compile(
+        r"\b(?P<keyword>SELECT|FROM|WHERE|JOIN|INNER|LEFT|RIGHT|FULL|OUTER|"
+        r"GROUP BY|HAVING|ORDER BY|LIMIT|AS|AND|OR|NOT|NULL|"
+        r"INSERT|UPDATE|DELETE|CREATE|TABLE|INDEX|VIEW|"
+        r"EXISTS|BETWEEN|LIKE|IN|IS)\b"
+        r"|(?P<string>'[^']*')"
+        r"|(?P<comment>--[^\n]*)"
+        r"|\b(?P<function>COUNT|SUM|AVG|MIN|MAX)\b"
+        r"|(?P<operator>[=<>!+*/%\-;])",
+        re.IGNORECASE
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.configure(font=('Courier New', 12), wrap=tk.WORD)
+        self._highlighted_text = None  # Текст, для которого подсветка уже построена
+        self._hl_after_id = None  # Отложенный пересчет подсветки
         self._setup_tags()
         self.bind('<KeyRelease>', self._highlight)
         
@@ -20,27 +110,53 @@ class SQLText(scrolledtext.ScrolledText):
         self.tag_configure('operator', foreground='#AA22FF')
         
     def _highlight(self, event=None):
-        # Очищаем предыдущие теги
-        for tag in ['keyword', 'string', 'comment', 'function', 'operator']:
-            self.tag_remove(tag, '1.0', tk.END)
-
-        # Регулярные выражения для элементов SQL
-        patterns = [
-            (r'\b(SELECT|FROM|WHERE|JOIN|INNER|LEFT|RIGHT|FULL|OUTER|'
-            r'GROUP BY|HAVING|ORDER BY|LIMIT|AS|AND|OR|NOT|NULL|'
-            r'INSERT|UPDATE|DELETE|CREATE|TABLE|INDEX|VIEW|'
-            r'EXISTS|BETWEEN|LIKE|IN|IS)\b', 'keyword'),
-            (r"'[^']*'", 'string'),
-            (r'--.*$', 'comment'),
-            (r'\b(COUNT|SUM|AVG|MIN|MAX)\b', 'function'),
-            (r'[=<>!+*/%-;]', 'operator')  # Добавлена точка с запятой
-        ]
-
-        # Применяем подсветку
+        # Пока клавиши нажимаются подряд, пересчет откладывается
+        if self._hl_after_id is not None:
+            self.after_cancel(self._hl_after_id)
+        self._hl_after_id = self.after(HIGHLIGHT_DELAY_MS, self._do_highlight)
+
+    def _do_highlight(self):
+        self._hl_after_id = None
+        # Навигационные клавиши текст не меняют - подсветка остается прежней
         text = self.get('1.0', tk.END)
-        for pattern, tag in patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE | re.MULTILINE)
-            for match in matches:
-                start = f"1.0 + {match.start()}c"
-                end = f"1.0 + {match.end()}c"
-                self.tag_add(tag, start, end)
\ No newline at end of file
+        if text == self._highlighted_text:
+            return
+        old_text = self._highlighted_text
+        self._highlighted_text = text
+
+        if old_text is not None:
+            old_lines = old_text.split('\n')
+            new_lines = text.split('\n')
+            if len(old_lines) == len(new_lines):
+                changed = [i for i, (old, new) in enumerate(zip(old_lines, new_lines)) if old != new]
+                start, end = f"{changed[0] + 1}.0", f"{changed[-1] + 1}.end"
+                # Кавычка может открыть или закрыть строковый литерал на других строках,
+                # а правка внутри многострочного литерала меняет его целиком - тогда пересчитываем все
+                if (not any("'" in old_lines[i] or "'" in new_lines[i] for i in changed)
+                        and 'string' not in self.tag_names(start)
+                        and 'string' not in self.tag_names(end)):
+                    self._apply_tags(start, end)
+                    return
+
+        self._apply_tags('1.0', tk.END)
+
+    def _apply_tags(self, start, end):
+        """Перестраивает подсветку в диапазоне от start до end"""
+        # Очищаем предыдущие теги одним вызовом Tcl
+        self.tk.eval(f'foreach t {{keyword string comment function operator}} '
+                     f'{{{self._w} tag remove $t {start} {end}}}')
+
+        # Применяем подсветку. Индексы "строка.столбец" считаются по смещениям начала строк:
+        # "1.0 + Nc" заставлял бы Tk отсчитывать N символов для каждого совпадения
+        text = self.get(start, end)
+        first_line = int(start.split('.')[0])  # start всегда указывает на начало строки
+        line_starts = [0]
+        line_starts.extend(m.end() for m in re.finditer('\n', text))
+        ranges = defaultdict(list)
+        for match in self._PATTERN.finditer(text):
+            for offset in match.span():
+                line = bisect_right(line_starts, offset) - 1
+                ranges[match.lastgroup].append(f"{first_line + line}.{offset - line_starts[line]}")
+        # Все диапазоны одного тега добавляются одним вызовом
+        for tag, indices in ranges.items():
+            self.tag_add(tag, *indices)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 from hfpoint.gui.dialogs_main import TableMappingDialog, JoinRuleDialog, MappingDialog
+from hfpoint.gui.widgets import PagedRows
 
 class TableMappingWindow(tk.Toplevel):
     """Окно для управления маппингом таблиц"""
@@ -19,6 +20,7 @@ class TableMappingWindow(tk.Toplevel):
         self.tree.column('table', width=300)
         self.tree.column('connection', width=200)
         self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self._rows = PagedRows(self.tree)  # Большие списки выводятся по мере прокрутки
         
         btn_frame = ttk.Frame(self)
         btn_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -29,9 +31,10 @@ class TableMappingWindow(tk.Toplevel):
         ttk.Button(btn_frame, text="Сохранить", command=self.save_mappings).pack(side=tk.RIGHT)
     
     def _load_mappings(self):
-        self.tree.delete(*self.tree.get_children())
-        for table, connection in self.fdw.table_mapping.items():
-            self.tree.insert('', 'end', values=(table, connection))
+        # Строка таблицы идентифицируется именем таблицы; обновляются только изменившиеся
+        self._rows.set_rows({
+            table: (table, connection) for table, connection in self.fdw.table_mapping.items()
+        })
     
     def add_mapping(self):
         dialog = TableMappingDialog(self, list(self.fdw.connection_params.keys()))
@@ -103,6 +106,7 @@ class JoinRulesWindow(tk.Toplevel):
         self.tree.column('tables', width=400)
         self.tree.column('join_type', width=100)
         self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self._rows = PagedRows(self.tree)  # Большие списки выводятся по мере прокрутки
         
         btn_frame = ttk.Frame(self)
         btn_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -113,14 +117,11 @@ class JoinRulesWindow(tk.Toplevel):
         ttk.Button(btn_frame, text="Сохранить", command=self.save_rules).pack(side=tk.RIGHT)
     
     def _load_rules(self):
-        self.tree.delete(*self.tree.get_children())
-        for rule in self.fdw.join_config:
-            tables = ", ".join(rule['tables'])
-            self.tree.insert('', 'end', values=(
-                rule['key'],
-                tables,
-                rule['join_type']
-            ))
+        # Правила идентифицируются позицией в списке: edit_rule и delete_rule берут индекс строки
+        self._rows.set_rows({
+            str(i): (rule['key'], ", ".join(rule['tables']), rule['join_type'])
+            for i, rule in enumerate(self.fdw.join_config)
+        })
     
     def add_rule(self):
         dialog = JoinRuleDialog(self, self._get_all_tables())
@@ -190,6 +191,7 @@ class SchemaMappingWindow(tk.Toplevel):
         self.tree.column('schema', width=200)
         self.tree.column('connection', width=200)
         self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self._rows = PagedRows(self.tree)  # Большие списки выводятся по мере прокрутки
         
         # Кнопки управления
         btn_frame = ttk.Frame(self)
@@ -202,9 +204,9 @@ class SchemaMappingWindow(tk.Toplevel):
     
     def _load_mappings(self):
         """Загрузка маппингов в таблицу"""
-        self.tree.delete(*self.tree.get_children())
-        for schema, connection in self.fdw.schema_mapping.items():
-            self.tree.insert('', 'end', values=(schema, connection))
+        self._rows.set_rows({
+            schema: (schema, connection) for schema, connection in self.fdw.schema_mapping.items()
+        })
     
     def add_mapping(self):
         """Добавление нового маппинга"""
@@ -219,7 +221,7 @@ class SchemaMappingWindow(tk.Toplevel):
                 messagebox.showerror("Ошибка", f"Подключение {connection} не существует!")
                 return
                 
-            self.fdw.schema_mapping[schema] = connection
+            self.fdw.map_schema(schema, connection)
             self._load_mappings()
             
             # Сразу сохраняем изменения
@@ -242,8 +244,8 @@ class SchemaMappingWindow(tk.Toplevel):
         if dialog.result:
             new_schema, new_connection = dialog.result
             if new_schema != schema:
-                del self.fdw.schema_mapping[schema]
-            self.fdw.schema_mapping[new_schema] = new_connection
+                self.fdw.unmap_schema(schema)
+            self.fdw.map_schema(new_schema, new_connection)
             self._load_mappings()
     
     def delete_mapping(self):
@@ -256,7 +258,7 @@ class SchemaMappingWindow(tk.Toplevel):
         schema, _ = item['values']
         
         if messagebox.askyesno("Подтверждение", f"Удалить маппинг для схемы '{schema}'?"):
-            del self.fdw.schema_mapping[schema]
+            self.fdw.unmap_schema(schema)
             self._load_mappings()
     
     def save_mappings(self):